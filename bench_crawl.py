@@ -0,0 +1,174 @@
+import argparse
+import csv
+import glob
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import bench_server
+
+# End-to-end throughput of the scrapers against bench_server.py. Each
+# scraper runs as its own process in a scratch directory, pointed at the
+# stand-in via COZYING_BASE_URL; listings/sec comes from the rows it
+# exported, latency percentiles from the server, peak RSS from wait4.
+REPO = os.path.dirname(os.path.abspath(__file__))
+TARGETS = {
+    "reqsell": ["reqsell.py"],
+    "reqrent": ["reqrent.py"],
+    "sellasync": ["sellasync.py", "--fast"],
+    "rentasync": ["rentasync.py", "--fast"],
+}
+BROWSER_TARGETS = {"sellasync", "rentasync"}
+TIMEOUT = 1800
+
+
+def count_rows(workdir):
+    rows = 0
+    for path in glob.glob(os.path.join(workdir, "*.csv")):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows += max(0, sum(1 for _ in csv.reader(f)) - 1)
+    return rows
+
+
+def exit_code(status):
+    # os.waitstatus_to_exitcode is 3.9+
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def run(name, base_url, timeout=TIMEOUT, extra=()):
+    env = dict(os.environ, COZYING_BASE_URL=base_url)
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        argv = [sys.executable, os.path.join(REPO, TARGETS[name][0]),
+                *TARGETS[name][1:], "--format", "csv", *extra]
+        log = open(os.path.join(workdir, "output.log"), "w")
+        start = time.perf_counter()
+        proc = subprocess.Popen(argv, cwd=workdir, env=env, stdout=log,
+                                stderr=subprocess.STDOUT)
+        peak_rss = None
+        try:
+            if hasattr(os, "wait4"):
+                deadline = start + timeout
+                while True:
+                    pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+                    if pid:
+                        proc.returncode = exit_code(status)
+                        # kilobytes on Linux, bytes on macOS
+                        scale = 1 if sys.platform == "darwin" else 1024
+                        peak_rss = usage.ru_maxrss * scale
+                        break
+                    if time.perf_counter() > deadline:
+                        raise subprocess.TimeoutExpired(argv, timeout)
+                    time.sleep(0.05)
+            else:
+                proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        elapsed = time.perf_counter() - start
+        log.close()
+
+        rows = count_rows(workdir)
+        if proc.returncode != 0:
+            with open(os.path.join(workdir, "output.log")) as f:
+                tail = f.read()[-2000:]
+            print(f"[bench] {name} exited with {proc.returncode}:\n{tail}")
+
+    return {
+        "listings": rows,
+        "seconds": elapsed,
+        "listings_per_sec": rows / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak_rss / 2 ** 20 if peak_rss else None,
+        "exit_code": proc.returncode,
+    }
+
+
+def report(results):
+    print(f"{'target':<10} {'listings':>8} {'secs':>8} {'list/s':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'rss MB':>8}")
+    for name, r in results.items():
+        # the request kind that dominates the run: detail pages if any
+        server = r["server"]
+        kind = "detail" if "detail" in server else "api"
+        lat = server.get(kind, {"p50_ms": 0.0, "p99_ms": 0.0})
+        rss = f"{r['peak_rss_mb']:8.1f}" if r["peak_rss_mb"] else f"{'n/a':>8}"
+        print(f"{name:<10} {r['listings']:>8} {r['seconds']:>8.1f} "
+              f"{r['listings_per_sec']:>8.1f} {lat['p50_ms']:>8.1f} "
+              f"{lat['p99_ms']:>8.1f} {rss}")
+
+
+def compare(results, baseline_path, tolerance):
+    # fails when a target got slower than the baseline by more than tolerance
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = 0
+    for name, r in results.items():
+        old = baseline.get(name)
+        if not old or not old["listings_per_sec"]:
+            continue
+        change = r["listings_per_sec"] / old["listings_per_sec"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<10} {old['listings_per_sec']:8.1f} -> "
+              f"{r['listings_per_sec']:8.1f} list/s ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against bench_server.py")
+    parser.add_argument("targets", nargs="*", default=list(TARGETS),
+                        help=f"any of {', '.join(TARGETS)} (default: all)")
+    parser.add_argument("--size", type=int, default=bench_server.CATALOGUE_SIZE,
+                        help="listings per type")
+    parser.add_argument("--latency", type=float, default=50.0, metavar="MS",
+                        help="mean server delay per request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=int, default=TIMEOUT, metavar="SECS")
+    parser.add_argument("--parcel", action="store_true",
+                        help="run the request crawlers with --parcel (detail page for every listing)")
+    parser.add_argument("--json", metavar="PATH", help="write the results here")
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="results of an earlier --json run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed listings/sec drop against the baseline")
+    args = parser.parse_args()
+
+    server = bench_server.start(size=args.size, latency=args.latency / 1000,
+                                error_rate=args.error_rate)
+    print(f"[bench] Stand-in on {server.base_url}: {args.size} listings per type, "
+          f"{args.latency:.0f} ms latency, {args.error_rate:.1%} errors")
+
+    results = {}
+    for name in args.targets:
+        if name not in TARGETS:
+            parser.error(f"unknown target {name}")
+        if name in BROWSER_TARGETS and importlib.util.find_spec("playwright") is None:
+            print(f"[bench] {name}: playwright not installed, skipped")
+            continue
+        server.stats.reset()
+        print(f"[bench] Running {name}")
+        extra = ["--parcel"] if args.parcel else []
+        results[name] = run(name, server.base_url, args.timeout, extra)
+        results[name]["server"] = server.stats.summary()
+    server.shutdown()
+
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "size": args.size, "latency_ms": args.latency,
+                "error_rate": args.error_rate, "parcel": args.parcel, "results": results,
+            }, f, indent=2)
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+import argparse
+import glob
+import os
+import time
+import client
+from homelist import BASE_URL, fetch_page
+from parcel import BACKENDS, MISSING, extract_parcel
+
+FIXTURES = os.path.join("fixtures", "detail")
+
+
+def save_fixtures(count, type="sale", path=FIXTURES):
+    os.makedirs(path, exist_ok=True)
+    saved = 0
+    page = 0
+    while saved < count:
+        homes = fetch_page(type, page)
+        if not homes:
+            break
+        for home in homes:
+            url = home.get("url", "")
+            if not url:
+                continue
+            resp = client.get(BASE_URL + url)
+            resp.raise_for_status()
+            name = url.strip("/").replace("/", "_") + ".html"
+            with open(os.path.join(path, name), "w", encoding="utf-8") as f:
+                f.write(resp.text)
+            saved += 1
+            if saved >= count:
+                break
+        page += 1
+    print(f"Saved {saved} detail pages to {path}")
+
+
+def load_fixtures(path=FIXTURES):
+    pages = {}
+    for name in sorted(glob.glob(os.path.join(path, "*.html"))):
+        with open(name, encoding="utf-8") as f:
+            pages[os.path.basename(name)] = f.read()
+    return pages
+
+
+def bench(pages, rounds):
+    # bs4 is the reference; every backend has to agree with it on every page
+    expected = {name: BACKENDS["bs4"](text) for name, text in pages.items()}
+    mismatches = 0
+    for backend, parse in BACKENDS.items():
+        try:
+            parse("<html></html>")
+        except ImportError:
+            print(f"{backend:>5}: not installed, skipped")
+            continue
+
+        fallbacks = 0
+        for name, text in pages.items():
+            if parse(text) is MISSING:
+                fallbacks += 1
+            got = extract_parcel(text, backend)
+            if got != expected[name]:
+                mismatches += 1
+                print(f"{backend:>5}: {name}: expected {expected[name]!r}, got {got!r}")
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in pages.values():
+                extract_parcel(text, backend)
+        elapsed = time.perf_counter() - start
+        per_page = elapsed / (rounds * len(pages)) * 1000
+        print(f"{backend:>5}: {per_page:8.3f} ms/page  "
+              f"({len(pages) / (elapsed / rounds):8.1f} pages/s, {fallbacks} bs4 fallbacks)")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parcel number extraction")
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--save", type=int, metavar="N",
+                        help="download N live detail pages into the fixtures folder first")
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.save, path=args.fixtures)
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        print(f"No fixtures in {args.fixtures}; record some with --save N")
+        return 1
+
+    print(f"{len(pages)} fixtures, {args.rounds} rounds")
+    mismatches = bench(pages, args.rounds)
+    if mismatches:
+        print(f"{mismatches} mismatches against bs4")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
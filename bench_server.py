@@ -0,0 +1,342 @@
+import argparse
+import bisect
+import html
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Local stand-in for cozying.ai: the list API, detail pages and the two
+# search pages the Playwright crawlers walk. Homes come from recorded API
+# pages in fixtures/api/{sale,rent}.json and detail HTML from
+# fixtures/detail/*.html (bench_parcel.py --save), repeated with unique
+# URLs up to the catalogue size. Without fixtures it serves generated
+# homes and a minimal detail page with the same markup.
+API_FIXTURES = os.path.join("fixtures", "api")
+DETAIL_FIXTURES = os.path.join("fixtures", "detail")
+LIST_PATH = "/cozying-api/v1/home/list"
+SEARCH_PATHS = {"/los-angeles-ca": "sale", "/los-angeles-ca/rent": "rent"}
+SEARCH_PAGE_SIZE = 20
+CATALOGUE_SIZE = 2000
+AGENTS = 100
+
+DETAIL_HTML = """<html><body>
+<article class="summary">
+  <p class="summary__address">{street}, Los Angeles, CA {zip}</p>
+  <p class="summary__price total-price">${price:,}</p>
+  <ul class="summary__properties">
+    <li class="summary__property"><span>{beds}</span><span>Beds</span></li>
+    <li class="summary__property"><span>{baths}</span><span>Baths</span></li>
+    <li class="summary__property"><span>{size:,}</span><span>sqft</span></li>
+    <li class="summary__property"><span>{lot:,}</span><span>sqft lot</span></li>
+  </ul>
+</article>
+<div class="highlights__properties">
+  <div class="highlights__property"><div class="highlights__property-label">Year built</div><div class="highlights__property-value">{year}</div></div>
+  <div class="highlights__property"><div class="highlights__property-label">Home Type</div><div class="highlights__property-value">{type}</div></div>
+</div>
+<article class="listing-information">
+  <div class="listing-information__agent"><ul>
+    <li>Name: {agent_name}</li><li>Email: {agent_email}</li><li>Phone: {agent_phone}</li>
+  </ul></div>
+  <div class="listing-information__office"><ul>
+    <li>Name: {office_name}</li><li>Email: {office_email}</li><li>Phone: {office_phone}</li>
+  </ul></div>
+</article>
+<article class="other-properties">
+  <section class="other-property">
+    <h6 class="other-property__title">Exterior</h6>
+    <div class="other-property__item"><span class="item-title">Details</span>
+      <ul><li>Parcel Number: {parcel}</li></ul></div>
+  </section>
+</article>
+</body></html>"""
+
+# Renders the results list from the list API like the real search page, so
+# ListingCapture sees the same responses.
+SEARCH_HTML = """<html><body>
+<button class="remove-boundary-btn">Remove boundary</button>
+<div class="search-result__list"></div>
+<nav class="pagination"><ul>
+  <li class="pagination__nav">Prev</li>
+  <li class="pagination__nav" id="next">Next</li>
+</ul></nav>
+<script>
+let page = {page} - 1;
+let bounded = true;
+async function render() {{
+  const resp = await fetch("{list_path}?currentPage=" + page +
+    "&homesPerGroup={page_size}&type={type}" + (bounded ? "&bounded=1" : ""));
+  const homes = (await resp.json()).homes;
+  document.querySelector("div.search-result__list").innerHTML =
+    homes.map((h) => '<a href="' + h.url + '">' + h.fullAddress + "</a>").join("");
+  document.getElementById("next").className =
+    "pagination__nav" + (homes.length < {page_size} ? " link-disabled" : "");
+}}
+document.querySelector("button.remove-boundary-btn").onclick = (e) => {{
+  bounded = false; e.target.remove(); render();
+}};
+document.getElementById("next").onclick = () => {{ page += 1; render(); }};
+render();
+</script>
+</body></html>"""
+
+
+def synthetic_home(type, i):
+    # Like the real list API, only sale homes carry the agent and office
+    # blocks; rent homes have just agentId/officeId and the contacts are on
+    # the detail page.
+    agent = i % AGENTS
+    office = i % (AGENTS // 5 or 1)
+    home = {
+        "url": f"/bench/{type}/home-{i}",
+        "fullAddress": f"{100 + i} Bench St, Los Angeles, CA 9{i % 10000:04d}",
+        "price": 500_000 + i * 1000 if type == "sale" else 2000 + i,
+        "beds": 1 + i % 5,
+        "baths": 1 + i % 3,
+        "size": 800 + i % 2000,
+        "lotSizeSqft": 2000 + i % 5000,
+        "yearBuilt": 1950 + i % 70,
+        "cozyingPropertyType": "Single Family",
+        "propertyType": "Apartment",
+        "agentId": f"A{agent}",
+        "officeId": f"O{office}",
+        "parcel": f"{4000000000 + i}",
+    }
+    if type == "sale":
+        home["agent"] = {"agentId": f"A{agent}", "agentName": f"Agent {agent}",
+                         "agentEmail": f"agent{agent}@example.com", "agentPhone": f"555-01{agent:02d}"}
+        home["agentOffice"] = {"officeId": f"O{office}", "officeName": f"Office {office}",
+                               "officeEmail": f"office{office}@example.com", "officePhone": f"555-02{office:02d}"}
+    return home
+
+
+def synthetic_detail(home):
+    street, _, rest = home["fullAddress"].partition(",")
+    agent, office = home.get("agent") or {}, home.get("agentOffice") or {}
+    return DETAIL_HTML.format(
+        street=html.escape(street), zip=(rest.split() or [""])[-1],
+        price=home["price"] or 0, beds=home["beds"] or 0, baths=home["baths"] or 0,
+        size=home["size"] or 0, lot=home["lotSizeSqft"] or 0, year=home["yearBuilt"] or "",
+        type=home.get("cozyingPropertyType") or home.get("propertyType"),
+        agent_name=agent.get("agentName", ""), agent_email=agent.get("agentEmail", ""),
+        agent_phone=agent.get("agentPhone", ""), office_name=office.get("officeName", ""),
+        office_email=office.get("officeEmail", ""), office_phone=office.get("officePhone", ""),
+        parcel=home["parcel"],
+    )
+
+
+def load_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def load_details(path):
+    pages = []
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".html"):
+                with open(os.path.join(path, name), encoding="utf-8") as f:
+                    pages.append(f.read())
+    return pages
+
+
+class Catalogue:
+    def __init__(self, size=CATALOGUE_SIZE, api_path=API_FIXTURES,
+                 detail_path=DETAIL_FIXTURES):
+        self.details = load_details(detail_path)
+        self.homes = {}
+        self.by_url = {}
+        for type in ("sale", "rent"):
+            recorded = load_json(os.path.join(api_path, f"{type}.json"))
+            homes = []
+            for i in range(size):
+                if recorded:
+                    home = dict(recorded[i % len(recorded)])
+                    # unique URL per copy, same agents and offices
+                    home["url"] = f"{home.get('url', '/home').rstrip('/')}-{i}"
+                else:
+                    home = synthetic_home(type, i)
+                homes.append(home)
+                self.by_url[home["url"]] = (home, i)
+            self.homes[type] = homes
+
+    def page(self, type, page, per_page):
+        homes = self.homes.get(type, [])
+        return homes[page * per_page:(page + 1) * per_page]
+
+    def detail(self, url):
+        found = self.by_url.get(url)
+        if found is None:
+            return None
+        home, i = found
+        if self.details:
+            return self.details[i % len(self.details)]
+        # the sale home of the same index fills in what the API home lacks
+        # (contacts of rent homes, the parcel number of recorded ones)
+        return synthetic_detail({**synthetic_home("sale", i), **home})
+
+
+class Stats:
+    # Service times per route kind, for p50/p99 in bench_crawl.py.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.latencies = {}
+            self.statuses = {}
+
+    def add(self, kind, status, latency):
+        with self.lock:
+            bisect.insort(self.latencies.setdefault(kind, []), latency)
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self):
+        with self.lock:
+            out = {"statuses": dict(self.statuses)}
+            for kind, values in self.latencies.items():
+                out[kind] = {
+                    "requests": len(values),
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000,
+                }
+            return out
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))
+    return sorted_values[index]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        start = time.perf_counter()
+        server = self.server
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        if parts.path == LIST_PATH:
+            kind = "api"
+        elif parts.path in SEARCH_PATHS:
+            kind = "search"
+        else:
+            kind = "detail"
+
+        if server.latency:
+            time.sleep(server.latency * random.uniform(0.5, 1.5))
+
+        if kind != "search" and random.random() < server.error_rate:
+            status = random.choice((429, 500, 503))
+            self.send(status, b"error", "text/plain", {"Retry-After": "1"} if status == 429 else None)
+        elif kind == "api":
+            type = query.get("type", ["sale"])[0]
+            page = int(query.get("currentPage", ["0"])[0])
+            per_page = int(query.get("homesPerGroup", ["200"])[0])
+            homes = server.catalogue.page(type, page, per_page)
+            if "bounded" in query:
+                homes = homes[::-1]
+            status = 200
+            self.send(status, json.dumps({"homes": homes}).encode(), "application/json")
+        elif kind == "search":
+            page = int(query.get("page", ["1"])[0])
+            body = SEARCH_HTML.format(
+                page=page, type=SEARCH_PATHS[parts.path],
+                list_path=LIST_PATH, page_size=SEARCH_PAGE_SIZE,
+            )
+            status = 200
+            self.send(status, body.encode(), "text/html; charset=utf-8")
+        else:
+            body = server.catalogue.detail(parts.path)
+            status = 200 if body is not None else 404
+            self.send(status, (body or "not found").encode(), "text/html; charset=utf-8")
+
+        server.stats.add(kind, status, time.perf_counter() - start)
+
+    def send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(port=0, size=CATALOGUE_SIZE, latency=0.0, error_rate=0.0,
+                api_path=API_FIXTURES, detail_path=DETAIL_FIXTURES):
+    # latency is the mean delay per request in seconds; port 0 picks a free one
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.catalogue = Catalogue(size, api_path, detail_path)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.stats = Stats()
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    return server
+
+
+def start(**kwargs):
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record(pages, path=API_FIXTURES):
+    # save `pages` live list API pages per type as fixtures
+    from homelist import fetch_page
+
+    os.makedirs(path, exist_ok=True)
+    for type in ("sale", "rent"):
+        homes = []
+        for page in range(pages):
+            batch = fetch_page(type, page)
+            if not batch:
+                break
+            homes.extend(batch)
+        with open(os.path.join(path, f"{type}.json"), "w", encoding="utf-8") as f:
+            json.dump(homes, f)
+        print(f"Saved {len(homes)} {type} homes to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for cozying.ai")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--size", type=int, default=CATALOGUE_SIZE,
+                        help="listings per type")
+    parser.add_argument("--latency", type=float, default=0.0, metavar="MS",
+                        help="mean delay per request")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of API/detail requests answered with 429/500/503")
+    parser.add_argument("--record", type=int, metavar="PAGES",
+                        help="download PAGES live API pages per type into fixtures/api first")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record)
+
+    server = make_server(args.port, args.size, args.latency / 1000, args.error_rate)
+    print(f"Serving {args.size} listings per type on {server.base_url}")
+    print(f"Run a scraper against it with COZYING_BASE_URL={server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
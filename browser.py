@@ -0,0 +1,276 @@
+# Helpers shared by the Playwright crawlers (rentasync / sellasync).
+import asyncio
+import logging
+import time
+from urllib.parse import urlsplit
+import throttle
+import metrics
+from homelist import BASE_URL, home_record
+from extractor import empty_record
+
+log = logging.getLogger("browser")
+
+# Fast mode only lets through what is needed to render the listing DOM:
+# first-party documents, scripts and API calls. Hosts in ALLOWED_HOSTS are
+# treated as first-party (add CDNs here if the site starts serving its
+# bundles from one).
+BLOCKED_RESOURCE_TYPES = {
+    "image", "media", "font", "stylesheet", "manifest",
+    "texttrack", "eventsource", "websocket", "other",
+}
+ALLOWED_HOSTS = ("cozying.ai", urlsplit(BASE_URL).hostname)
+
+# Reads every field scrape_page needs in one page.evaluate call instead of
+# one CDP round-trip per inner_text(). Called with extractor.SELECTORS as its
+# argument; returns the same raw texts as extractor.extract_raw, which
+# build_record turns into a listing record.
+EXTRACT_JS = """
+(sel) => {
+  const text = (el) => (el ? el.innerText : "");
+  const all = (root, s) => Array.from(root.querySelectorAll(s));
+  return {
+    address: text(document.querySelector(sel.address)),
+    price: text(document.querySelector(sel.price)),
+    summary: all(document, sel.summary).map((li) => all(li, sel.summary_item).map(text)),
+    highlights: all(document, sel.highlights).map((h) => [
+      text(h.querySelector(sel.highlight_label)),
+      text(h.querySelector(sel.highlight_value)),
+    ]),
+    agent: all(document, sel.agent).map(text),
+    office: all(document, sel.office).map(text),
+    others: all(document, sel.others).map((s) => ({
+      title: text(s.querySelector(sel.other_title)),
+      items: all(s, sel.other_items).map(text),
+    })),
+  };
+}
+"""
+
+
+def first_party(url):
+    host = urlsplit(url).hostname or ""
+    return any(host == h or host.endswith("." + h) for h in ALLOWED_HOSTS)
+
+
+async def block_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or not first_party(request.url):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def new_context(browser, fast):
+    context = await browser.new_context()
+    if fast:
+        await context.route("**/*", block_resources)
+    return context
+
+
+async def visit(page, url, wait_until="load", deadline=throttle.DEADLINE,
+                attempts=throttle.MAX_ATTEMPTS):
+    # page.goto under the shared throttle limiter, with the same retry policy
+    # as client.get: 429/5xx and navigation errors are retried with jittered
+    # backoff until `attempts` or the deadline runs out. Only a "commit"
+    # wait is comparable to an HTTP response time; full page loads are
+    # judged against the browser latency target.
+    limiter = throttle.get_limiter()
+    target = None if wait_until == "commit" else throttle.BROWSER_TARGET_LATENCY
+    end = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        remaining = end - time.monotonic()
+        if remaining <= 0 or not await limiter.acquire_async(remaining):
+            raise TimeoutError(f"Deadline exceeded for {url}")
+
+        resp = error = None
+        start = time.monotonic()
+        try:
+            resp = await page.goto(url, wait_until=wait_until, timeout=remaining * 1000)
+        except Exception as e:
+            error = e
+            limiter.release(time.monotonic() - start, throttle.ERROR)
+        else:
+            status = resp.status if resp is not None else 200
+            limiter.release(time.monotonic() - start, throttle.outcome_for(status), target)
+            metrics.observe("detail_fetch", time.monotonic() - start)
+            if status not in throttle.RETRY_STATUSES:
+                return resp
+
+        attempt += 1
+        wait = throttle.retry_after(resp.headers) if resp is not None else None
+        delay = throttle.backoff_delay(attempt, wait)
+        if attempt >= attempts or time.monotonic() + delay >= end:
+            if error is not None:
+                raise error
+            return resp
+        metrics.count("retries")
+        log.info("[visit] %s for %s, retry %s in %.1fs",
+                 resp.status if resp is not None else error, url, attempt, delay)
+        await asyncio.sleep(delay)
+
+
+PAGE_MAX_USES = 50
+
+
+class PagePool:
+    # Fixed set of warm tabs in one context. fetch_detail borrows a page and
+    # gives it back; a page is closed and replaced after PAGE_MAX_USES
+    # listings (or when a scrape failed on it) so Chromium memory stays
+    # bounded on long crawls.
+    def __init__(self, context, size, max_uses=PAGE_MAX_USES):
+        self.context = context
+        self.size = size
+        self.max_uses = max_uses
+        self.queue = asyncio.Queue()
+        self.uses = {}
+
+    async def start(self):
+        for _ in range(self.size):
+            await self.add_page()
+
+    async def add_page(self):
+        page = await self.context.new_page()
+        self.uses[page] = 0
+        self.queue.put_nowait(page)
+
+    async def acquire(self):
+        return await self.queue.get()
+
+    async def release(self, page, broken=False):
+        self.uses[page] += 1
+        if broken or page.is_closed() or self.uses[page] >= self.max_uses:
+            del self.uses[page]
+            if not page.is_closed():
+                await page.close()
+            await self.add_page()
+        else:
+            self.queue.put_nowait(page)
+
+    async def close(self):
+        for page in list(self.uses):
+            if not page.is_closed():
+                await page.close()
+        self.uses.clear()
+
+
+LIST_CHANGED_JS = """
+(prev) => {
+  const a = document.querySelector("div.search-result__list a");
+  return a !== null && a.getAttribute("href") !== prev;
+}
+"""
+
+
+async def wait_for_list_change(page, prev_first, timeout=60_000):
+    # Resolves once the first result link differs from prev_first, i.e. the
+    # results list has been re-rendered after a click.
+    await page.wait_for_function(LIST_CHANGED_JS, arg=prev_first, timeout=timeout)
+
+
+class PageProgress:
+    # Tracks how many detail URLs of each results page are still queued or
+    # running. Pages overlap in the pipeline, so on_finished(resume_page) is
+    # called strictly in page order once every page before it is done. A
+    # page with a failed URL stays the resume page for the rest of the run,
+    # so --resume comes back to it and retries what was not marked done.
+    def __init__(self, first_page, on_finished):
+        self.remaining = {}
+        self.failed = set()
+        self.next_page = first_page
+        self.on_finished = on_finished
+
+    def add(self, page_idx, count):
+        self.remaining[page_idx] = count
+        self.advance()
+
+    def done(self, page_idx, ok=True):
+        self.remaining[page_idx] -= 1
+        if not ok:
+            self.failed.add(page_idx)
+        self.advance()
+
+    def advance(self):
+        while self.remaining.get(self.next_page) == 0:
+            del self.remaining[self.next_page]
+            self.next_page += 1
+            self.on_finished(min(self.failed, default=self.next_page))
+
+
+LIST_API_PATH = "/cozying-api/v1/home/list"
+
+
+class ListingCapture:
+    # Keeps the homes the search page itself loads from the list API, keyed
+    # by listing link, so most listings never need their own page render.
+    # Rent homes only carry agentId/officeId: their contacts come from the
+    # resolver (agents/offices tables), which learn() fills from the pages
+    # that did have to be rendered.
+    def __init__(self, type_key, need_parcel=False, resolver=None):
+        self.type_key = type_key
+        self.need_parcel = need_parcel
+        self.resolver = resolver
+        self.homes = {}
+        self.ids = {}
+
+    def attach(self, page):
+        page.on("response", self.on_response)
+
+    async def on_response(self, response):
+        if LIST_API_PATH not in response.url or not response.ok:
+            return
+        try:
+            data = await response.json()
+        except Exception:
+            return
+        for home in data.get("homes", []):
+            if home.get("url"):
+                self.homes[BASE_URL + home["url"]] = home
+
+    def record(self, link):
+        # Full record from the captured JSON, or None when the listing was
+        # not captured or the JSON lacks fields only the detail page has.
+        home = self.homes.pop(link, None)
+        if home is None or self.need_parcel:
+            return None
+
+        res = empty_record(link)
+        res.update(home_record(home, self.type_key))
+        agent = home.get("agent") or {}
+        office = home.get("agentOffice") or {}
+        ids = {
+            "agent": home.get("agentId") or agent.get("agentId"),
+            "office": home.get("officeId") or office.get("officeId"),
+        }
+        rows = {
+            "agent": (agent.get("agentName"), agent.get("agentEmail"), agent.get("agentPhone")),
+            "office": (office.get("officeName"), office.get("officeEmail"), office.get("officePhone")),
+        }
+        for section, row in rows.items():
+            if not row[0] and self.resolver and ids[section]:
+                row = self.resolver.lookup(section, ids[section]) or row
+            name, email, number = (value or "" for value in row)
+            res.update({
+                f"listing_provided_{section}_name":   name,
+                f"listing_provided_{section}_email":  email,
+                f"listing_provided_{section}_number": number,
+            })
+        if not (res["listing_provided_agent_name"] and res["listing_provided_office_name"]):
+            self.ids[link] = ids
+            return None
+        return res
+
+    def learn(self, link, res):
+        # Contacts of a rendered listing, kept under the list API ids so the
+        # next homes of the same agent/office are saved without a render.
+        # Listings themselves still point at contacts by content (see
+        # schema.contact_key), like in runs without --capture-json.
+        ids = self.ids.pop(link, None)
+        if ids is None or self.resolver is None:
+            return
+        for section, id in ids.items():
+            prefix = f"listing_provided_{section}_"
+            row = (res.get(prefix + "name") or "", res.get(prefix + "email") or "",
+                   res.get(prefix + "number") or "")
+            if id and row[0]:
+                self.resolver.resolve(section, id, lambda: row)
@@ -0,0 +1,96 @@
+import logging
+import time
+from dbwriter import connect, BatchWriter
+
+CHECKPOINT_DB = "checkpoint.db"
+
+log = logging.getLogger("checkpoint")
+
+
+class Checkpoint:
+    # Durable progress for one scraper: the next page to crawl, every
+    # detail URL already finished and when the run started (exports only
+    # take listings seen since then). State is committed at page
+    # boundaries, so a crash loses at most the page that was in progress.
+    # Done URLs are held back until page_finished(), which callers run after
+    # flushing the listings themselves: a URL is never on record as done
+    # while its listing row is still queued in another database.
+    def __init__(self, name, resume=False, path=CHECKPOINT_DB):
+        self.name = name
+        self.conn = connect(path)
+        self.writer = BatchWriter(self.conn, batch_size=float("inf"),
+                                  flush_interval=float("inf"))
+        cur = self.conn.cursor()
+        cur.execute("""
+          CREATE TABLE IF NOT EXISTS checkpoints (
+            name    TEXT PRIMARY KEY,
+            page    INTEGER,
+            started REAL,
+            updated REAL
+          )
+        """)
+        columns = {row[1] for row in cur.execute("PRAGMA table_info(checkpoints)")}
+        if "started" not in columns:
+            cur.execute("ALTER TABLE checkpoints ADD COLUMN started REAL")
+        cur.execute("""
+          CREATE TABLE IF NOT EXISTS checkpoint_done (
+            name TEXT,
+            url  TEXT,
+            PRIMARY KEY (name, url)
+          )
+        """)
+        self.conn.commit()
+
+        if not resume:
+            self.clear()
+
+        cur.execute("SELECT page, started FROM checkpoints WHERE name = ?", (name,))
+        row = cur.fetchone()
+        self.page = row[0] if row else None
+        self.started = row[1] if row and row[1] else time.time()
+        if row is None:
+            cur.execute(
+                "INSERT INTO checkpoints(name, page, started, updated) VALUES(?,?,?,?)",
+                (name, None, self.started, self.started),
+            )
+            self.conn.commit()
+        cur.execute("SELECT url FROM checkpoint_done WHERE name = ?", (name,))
+        self.done_urls = {url for url, in cur.fetchall()}
+        cur.close()
+
+        if resume and self.page is not None:
+            log.info("[checkpoint] Resuming %s at page %s (%s listings already done)",
+                     name, self.page, len(self.done_urls))
+
+    def start_page(self, default=0):
+        return default if self.page is None else self.page
+
+    def is_done(self, url):
+        return url in self.done_urls
+
+    def done(self, url):
+        self.done_urls.add(url)
+        self.writer.add(
+            "INSERT OR IGNORE INTO checkpoint_done(name, url) VALUES(?,?)",
+            (self.name, url),
+        )
+
+    def page_finished(self, next_page):
+        self.page = next_page
+        self.writer.add(
+            "INSERT OR REPLACE INTO checkpoints(name, page, started, updated) VALUES(?,?,?,?)",
+            (self.name, next_page, self.started, time.time()),
+        )
+        self.writer.flush()
+
+    def clear(self):
+        self.writer.flush()
+        with self.conn:
+            self.conn.execute("DELETE FROM checkpoints WHERE name = ?", (self.name,))
+            self.conn.execute("DELETE FROM checkpoint_done WHERE name = ?", (self.name,))
+        self.page = None
+        self.done_urls = set()
+
+    def close(self):
+        self.writer.close()
+        self.conn.close()
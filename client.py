@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+import requests
+import throttle
+import httpcache
+import metrics
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("client")
+
+POOL_SIZE = 20
+TIMEOUT = (10, 30)
+
+# urllib3 only decodes brotli when one of the brotli packages is installed,
+# so only advertise it when we can actually read the response.
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+_session = None
+_cache = None
+_lock = threading.Lock()
+
+
+def make_session(pool_size=POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def configure(pool_size=POOL_SIZE, timeout=TIMEOUT):
+    global _session, TIMEOUT
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = make_session(pool_size)
+        TIMEOUT = timeout
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = make_session()
+    return _session
+
+
+def enable_cache(path=httpcache.CACHE_PATH, max_bytes=httpcache.MAX_BYTES, offline=False):
+    global _cache
+    with _lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = httpcache.ResponseCache(path, max_bytes, offline)
+    return _cache
+
+
+def get(url, **kwargs):
+    # Goes through the response cache when one is enabled: stored entries
+    # are revalidated (a 304 returns the stored body), or replayed without
+    # touching the network in offline mode.
+    cache = _cache
+    if cache is None or kwargs.get("params"):
+        return fetch(url, **kwargs)
+
+    entry = cache.get(url)
+    if cache.offline:
+        if entry is None:
+            raise requests.ConnectionError(f"{url} is not in the cache (offline mode)")
+        cache.hits += 1
+        metrics.count("cache_hits")
+        return cache.response(url, entry)
+    if entry is not None:
+        kwargs["headers"] = {**cache.validators(entry), **(kwargs.get("headers") or {})}
+
+    resp = fetch(url, **kwargs)
+    if resp.status_code == 304 and entry is not None:
+        cache.revalidated += 1
+        metrics.count("cache_hits")
+        return cache.response(url, entry)
+    cache.misses += 1
+    cache.store(url, resp)
+    return resp
+
+
+def fetch(url, deadline=throttle.DEADLINE, attempts=throttle.MAX_ATTEMPTS, **kwargs):
+    # Every request holds a slot of the shared AIMD limiter. 429/5xx and
+    # network errors are retried with jittered backoff until `attempts` or
+    # the deadline runs out; the last response (or error) is then returned
+    # (raised) as is.
+    limiter = throttle.get_limiter()
+    timeout = kwargs.pop("timeout", TIMEOUT)
+    end = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        remaining = end - time.monotonic()
+        if remaining <= 0 or not limiter.acquire(remaining):
+            raise requests.Timeout(f"Deadline exceeded for {url}")
+        if isinstance(timeout, tuple):
+            kwargs["timeout"] = tuple(min(t, remaining) for t in timeout)
+        else:
+            kwargs["timeout"] = min(timeout, remaining)
+
+        resp = error = None
+        start = time.monotonic()
+        try:
+            resp = get_session().get(url, **kwargs)
+        except requests.RequestException as e:
+            error = e
+            limiter.release(time.monotonic() - start, throttle.ERROR)
+        else:
+            limiter.release(time.monotonic() - start, throttle.outcome_for(resp.status_code))
+            if resp.status_code not in throttle.RETRY_STATUSES:
+                return resp
+
+        attempt += 1
+        wait = throttle.retry_after(resp.headers) if resp is not None else None
+        delay = throttle.backoff_delay(attempt, wait)
+        if attempt >= attempts or time.monotonic() + delay >= end:
+            if error is not None:
+                raise error
+            return resp
+        metrics.count("retries")
+        log.info("[client] %s for %s, retry %s in %.1fs",
+                 resp.status_code if resp is not None else error, url, attempt, delay)
+        time.sleep(delay)
+
+
+def close():
+    global _session, _cache
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _cache is not None:
+            log.info("[cache] %s", _cache.stats())
+            _cache.close()
+            _cache = None
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+import time
+import metrics
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2.0
+# seconds a write waits for another process (sharded workers, the other
+# scraper) to release the database before failing with "database is locked"
+BUSY_TIMEOUT = 30.0
+
+
+def connect(path, timeout=BUSY_TIMEOUT):
+    # WAL lets readers (exports, other scrapers) run while we write, and
+    # synchronous=NORMAL only fsyncs at checkpoints instead of every commit.
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class BatchWriter:
+    # Collects rows per statement and writes them with executemany in one
+    # transaction once BATCH_SIZE rows are queued or FLUSH_INTERVAL seconds
+    # have passed since the last flush. A flush that fails keeps its rows
+    # for the next one; on_commit callbacks run once the rows queued before
+    # them are committed.
+    def __init__(self, conn, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.callbacks = []
+        self.count = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, sql, params):
+        with self.lock:
+            self.pending.setdefault(sql, []).append(params)
+            self.count += 1
+            due = (
+                self.count >= self.batch_size
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def on_commit(self, callback):
+        with self.lock:
+            self.callbacks.append(callback)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            callbacks, self.callbacks = self.callbacks, []
+            count, self.count = self.count, 0
+            self.last_flush = time.monotonic()
+            if pending:
+                try:
+                    with metrics.timed("db_write"), self.conn:
+                        for sql, rows in pending.items():
+                            self.conn.executemany(sql, rows)
+                except Exception:
+                    self.pending, self.callbacks, self.count = pending, callbacks, count
+                    raise
+                metrics.count("db_rows", count)
+        for callback in callbacks:
+            callback()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
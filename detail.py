@@ -0,0 +1,36 @@
+CONTACT_KEYS = {
+    "name": "name",
+    "email": "email",
+    "phone": "number",
+}
+
+
+def parse_contact(soup, section):
+    # section is "agent" or "office"; returns None when the page has no block
+    div = soup.find("div", class_=f"listing-information__{section}")
+    if not div:
+        return None
+
+    fields = {}
+    for li in div.select("ul li"):
+        text = li.get_text(strip=True).lstrip("• ").split(":", 1)
+        if len(text) == 2:
+            label, value = text
+            key = CONTACT_KEYS.get(label.strip().lower())
+            if key:
+                fields[f"listing_provided_{section}_{key}"] = value.strip()
+    return fields
+
+
+
+def contact_row(fields, section):
+    # (name, email, phone) as stored in the agents/offices tables
+    if fields is None:
+        return None
+
+    prefix = f"listing_provided_{section}_"
+    return (
+        fields.get(prefix + "name", ""),
+        fields.get(prefix + "email", ""),
+        fields.get(prefix + "number", ""),
+    )
@@ -0,0 +1,174 @@
+import csv
+import os
+import metrics
+
+COLUMNS = [
+    "link", "street", "zip", "price", "beds", "baths", "sf1", "sf2", "year",
+    "property_and_building_type",
+    "listing_provided_agent_name", "listing_provided_agent_email",
+    "listing_provided_agent_number",
+    "listing_provided_office_name", "listing_provided_office_email",
+    "listing_provided_office_number",
+    "parcel_number",
+]
+
+NUMERIC_COLUMNS = {"price", "beds", "baths", "sf1", "sf2", "year"}
+
+EXCEL_MAX_ROWS = 1_048_576
+CHUNK_SIZE = 5000
+
+
+class CsvExporter:
+    def __init__(self, path, columns=COLUMNS):
+        self.columns = columns
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write_row(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class XlsxExporter:
+    # openpyxl write-only workbooks stream rows to disk instead of keeping a
+    # cell tree in memory. Excel caps a sheet at EXCEL_MAX_ROWS rows, so we
+    # roll over to a new sheet (with its own header) when one fills up.
+    def __init__(self, path, columns=COLUMNS, max_rows=EXCEL_MAX_ROWS):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.columns = columns
+        self.max_rows = max_rows
+        self.workbook = Workbook(write_only=True)
+        self.sheets = 0
+        self.new_sheet()
+
+    def new_sheet(self):
+        self.sheets += 1
+        self.sheet = self.workbook.create_sheet(f"Sheet{self.sheets}")
+        self.sheet.append(self.columns)
+        self.rows = 1
+
+    def write_row(self, row):
+        if self.rows >= self.max_rows:
+            self.new_sheet()
+        self.sheet.append(row)
+        self.rows += 1
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class ParquetExporter:
+    # Buffers CHUNK_SIZE rows and writes each buffer as one row group. The
+    # schema is fixed up front rather than inferred from the first chunk:
+    # NUMERIC_COLUMNS are float64 (baths can be 2.5), everything else is a
+    # string, so a later chunk can never disagree with it.
+    def __init__(self, path, columns=COLUMNS, chunk_size=CHUNK_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+
+        self.pa = pa
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.schema = pa.schema([
+            (column, pa.float64() if column in NUMERIC_COLUMNS else pa.string())
+            for column in columns
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_row(self, row):
+        self.buffer.append(row)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = {}
+        for i, column in enumerate(self.columns):
+            convert = to_float if column in NUMERIC_COLUMNS else to_str
+            data[column] = [convert(row[i]) for row in self.buffer]
+        self.writer.write_table(self.pa.table(data, schema=self.schema))
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def to_float(value):
+    # blanks (and text where a number belongs) are written as nulls
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_str(value):
+    return None if value is None else str(value)
+
+
+EXPORTERS = {
+    ".csv": CsvExporter,
+    ".xlsx": XlsxExporter,
+    ".parquet": ParquetExporter,
+}
+
+
+class Exporter:
+    # Writes records as they are produced; the exporter class is picked from
+    # the file extension. Records are dicts keyed by the columns, missing
+    # keys are written as blanks.
+    def __init__(self, path, columns=COLUMNS):
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in EXPORTERS:
+            raise ValueError(f"Unsupported export format: {ext}")
+        self.path = path
+        self.columns = columns
+        self.backend = EXPORTERS[ext](path, columns)
+        self.count = 0
+
+    def write(self, rec):
+        self.backend.write_row([rec.get(column, "") for column in self.columns])
+        self.count += 1
+
+    def write_row(self, row):
+        self.backend.write_row(list(row))
+        self.count += 1
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_query(conn, sql, path, params=(), chunk_size=CHUNK_SIZE):
+    # Streams a SELECT straight into an export file, CHUNK_SIZE rows at a time.
+    # The export stage is timed once per file, query included.
+    with metrics.timed("export"):
+        cur = conn.execute(sql, params)
+        columns = [d[0] for d in cur.description]
+        with Exporter(path, columns) as exporter:
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    exporter.write_row(row)
+        cur.close()
+    return exporter.count
+
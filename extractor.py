@@ -0,0 +1,155 @@
+from bs4 import BeautifulSoup as bs
+import client
+import metrics
+
+# One set of selectors for the listing detail page, used both by the
+# Playwright path (browser.EXTRACT_JS) and by extract_raw on plain HTML.
+SELECTORS = {
+    "summary_block": "article.summary",
+    "address": "article.summary p.summary__address",
+    "price": "article.summary p.summary__price.total-price",
+    "summary": "article.summary ul.summary__properties li.summary__property",
+    "summary_item": "span",
+    "highlights": "div.highlights__properties div.highlights__property",
+    "highlight_label": "div.highlights__property-label",
+    "highlight_value": "div.highlights__property-value",
+    "agent": "article.listing-information div.listing-information__agent ul li",
+    "office": "article.listing-information div.listing-information__office ul li",
+    "others": "article.other-properties section.other-property",
+    "other_title": "h6.other-property__title",
+    "other_items": "div.other-property__item ul li",
+}
+
+
+def empty_record(url):
+    return {
+        "link": url,
+        "street": "",
+        "zip": "",
+        "price": 0,
+        "beds": 0,
+        "baths": 0,
+        "sf1": 0,
+        "sf2": 0,
+        "year": 0,
+        "property_and_building_type": "",
+        "listing_provided_agent_name": "",
+        "listing_provided_agent_email": "",
+        "listing_provided_agent_number": "",
+        "listing_provided_office_name": "",
+        "listing_provided_office_email": "",
+        "listing_provided_office_number": "",
+        "parcel_number": "",
+    }
+
+
+def build_record(url, raw):
+    res = empty_record(url)
+
+    # Street & ZIP
+    street = raw["address"]
+    res["street"] = street.strip()
+    zip_code = street.split(" ")[-1].strip()
+    if zip_code.isdigit():
+        res["zip"] = zip_code
+
+    # Price
+    price_clean = raw["price"].replace("$", "").replace(",", "")
+    if price_clean.isdigit():
+        res["price"] = int(price_clean)
+
+    # Beds / Baths / SF1 / SF2
+    for spans in raw["summary"]:
+        if len(spans) < 2:
+            continue
+        key = spans[1].strip()
+        val = spans[0].replace(",", "").strip()
+        if val.isdigit():
+            num = int(val)
+            if key == "Beds":
+                res["beds"] = num
+            elif key == "Baths":
+                res["baths"] = num
+            elif key == "sqft":
+                res["sf1"] = num
+            elif key == "sqft lot":
+                res["sf2"] = num
+
+    # Year built / Home Type
+    for label, value in raw["highlights"]:
+        label = label.strip()
+        value = value.strip()
+        if label == "Year built" and value.isdigit():
+            res["year"] = int(value)
+        elif label == "Home Type":
+            res["property_and_building_type"] = value
+
+    # Agent & Office info
+    for section, prefix in [("agent", "listing_provided_agent_"),
+                            ("office", "listing_provided_office_")]:
+        for text in raw[section]:
+            if "Name:" in text:
+                res[prefix + "name"] = text.split(":", 1)[1].strip()
+            elif "Email:" in text:
+                res[prefix + "email"] = text.split(":", 1)[1].strip()
+            elif "Phone:" in text:
+                res[prefix + "number"] = text.split(":", 1)[1].strip()
+
+    # Parcel number under “Exterior”
+    for other in raw["others"]:
+        if other["title"].strip() == "Exterior":
+            for line in other["items"]:
+                if "Parcel Number:" in line:
+                    num = line.split(":", 1)[1].strip()
+                    if num.isdigit():
+                        res["parcel_number"] = num
+
+    return res
+
+
+
+def text(el):
+    # close enough to innerText for our fields: whitespace collapsed
+    return " ".join(el.get_text(" ").split()) if el else ""
+
+
+def extract_raw(soup):
+    sel = SELECTORS
+    return {
+        "address": text(soup.select_one(sel["address"])),
+        "price": text(soup.select_one(sel["price"])),
+        "summary": [
+            [text(span) for span in li.select(sel["summary_item"])]
+            for li in soup.select(sel["summary"])
+        ],
+        "highlights": [
+            [text(h.select_one(sel["highlight_label"])),
+             text(h.select_one(sel["highlight_value"]))]
+            for h in soup.select(sel["highlights"])
+        ],
+        "agent": [text(li) for li in soup.select(sel["agent"])],
+        "office": [text(li) for li in soup.select(sel["office"])],
+        "others": [
+            {"title": text(s.select_one(sel["other_title"])),
+             "items": [text(li) for li in s.select(sel["other_items"])]}
+            for s in soup.select(sel["others"])
+        ],
+    }
+
+
+def extract_record(url, html):
+    # None when the listing is not in the server-rendered HTML, i.e. the
+    # page needs JavaScript and has to go through the browser instead.
+    with metrics.timed("parse"):
+        soup = bs(html, "html.parser")
+        if soup.select_one(SELECTORS["summary_block"]) is None:
+            return None
+        return build_record(url, extract_raw(soup))
+
+
+def fetch_record(url):
+    with metrics.timed("detail_fetch"):
+        resp = client.get(url)
+    if not resp.ok:
+        return None
+    return extract_record(url, resp.text)
@@ -0,0 +1,71 @@
+import os
+import client
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+
+# Site root. Point COZYING_BASE_URL at a stand-in server (bench_server.py)
+# to run the scrapers without touching the live site.
+BASE_URL = os.environ.get("COZYING_BASE_URL", "https://cozying.ai").rstrip("/")
+API_URL = BASE_URL + "/cozying-api/v1/home/list?currentPage={page}&homesPerGroup=200&propertyStatus[]=active&sorted=newest&minPrice=0&maxPrice=0&minBeds=0&minBaths=0&hasOpenHouses=false&hasVirtualTour=false&type={type}"
+PAGES_IN_FLIGHT = 4
+
+
+def api_url(type, page):
+    return API_URL.format(type=type, page=page)
+
+
+def home_record(home, type_key):
+    # sale homes carry the type in cozyingPropertyType, rent homes in propertyType
+    full_addr = home.get("fullAddress", "")
+    street, *rest = full_addr.split(",")
+    rest = ", ".join(rest).strip()
+    zipcode = rest.split()[-1] if rest else ""
+
+    return {
+        "link":           BASE_URL + home.get("url", ""),
+        "street":         street.strip(),
+        "zip":            zipcode,
+        "price":          home.get("price", 0),
+        "beds":           home.get("beds") or 0,
+        "baths":          home.get("baths") or 0,
+        "sf1":            home.get("size", 0),
+        "sf2":            int(home.get("lotSizeSqft") or 0),
+        "year":           home.get("yearBuilt") or 0,
+        "property_and_building_type": home.get(type_key, ""),
+    }
+
+
+def fetch_page(type, page):
+    with metrics.timed("api_fetch"):
+        response = client.get(api_url(type, page))
+    metrics.count("api_pages")
+    response.raise_for_status()
+    data = response.json()
+    return data.get("homes", [])
+
+
+def iter_pages(type, start=0, in_flight=PAGES_IN_FLIGHT):
+    # Page numbers are known up front, so keep `in_flight` pages downloading
+    # while the caller works through the current one. Pages are yielded in
+    # order and paging stops at the first page with no homes.
+    pool = ThreadPoolExecutor(max_workers=in_flight)
+    pending = {}
+    next_page = start
+    page = start
+    try:
+        while True:
+            while len(pending) < in_flight:
+                pending[next_page] = pool.submit(fetch_page, type, next_page)
+                next_page += 1
+
+            homes = pending.pop(page).result()
+            if not homes:
+                break
+            yield page, api_url(type, page), homes
+            page += 1
+    finally:
+        # shutdown(cancel_futures=True) needs 3.9; the exe is built on 3.8
+        for future in pending.values():
+            future.cancel()
+        pool.shutdown(wait=False)
+
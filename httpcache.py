@@ -0,0 +1,141 @@
+import json
+import logging
+import threading
+import time
+import zlib
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from dbwriter import connect
+
+log = logging.getLogger("httpcache")
+
+CACHE_PATH = "http_cache.db"
+MAX_BYTES = 512 * 1024 * 1024
+# evict down to this fraction of MAX_BYTES so eviction does not run on
+# every store once the cache is full
+EVICT_TO = 0.9
+COMPRESS_LEVEL = 6
+
+# the stored body is already decoded, so these no longer apply to it
+DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class ResponseCache:
+    # Successful GET responses keyed by URL, bodies zlib-compressed, in one
+    # SQLite file. Entries are revalidated with ETag / Last-Modified rather
+    # than trusted blindly; in offline mode they are replayed as they are.
+    # When the stored bodies pass max_bytes the least recently used entries
+    # are dropped.
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, offline=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.conn = connect(path)
+        with self.lock, self.conn:
+            self.conn.execute("""
+              CREATE TABLE IF NOT EXISTS responses (
+                url           TEXT PRIMARY KEY,
+                status        INTEGER,
+                headers       TEXT,
+                body          BLOB,
+                etag          TEXT,
+                last_modified TEXT,
+                size          INTEGER,
+                stored        REAL,
+                last_used     REAL
+              )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)"
+            )
+            row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self.total = row[0]
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def get(self, url):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT status, headers, body, etag, last_modified FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+    def validators(self, entry):
+        # conditional request headers for a stored entry
+        _, _, _, etag, last_modified = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def response(self, url, entry):
+        status, headers, body, _, _ = entry
+        resp = requests.Response()
+        resp.url = url
+        resp.status_code = status
+        resp.reason = "OK"
+        resp.headers = CaseInsensitiveDict(json.loads(headers))
+        resp.encoding = get_encoding_from_headers(resp.headers)
+        resp._content = zlib.decompress(body)
+        resp.from_cache = True
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url)
+            )
+        return resp
+
+    def store(self, url, resp):
+        if resp.status_code != 200:
+            return
+        headers = {k: v for k, v in resp.headers.items() if k.lower() not in DROP_HEADERS}
+        body = zlib.compress(resp.content, COMPRESS_LEVEL)
+        now = time.time()
+        with self.lock, self.conn:
+            old = self.conn.execute(
+                "SELECT size FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            self.conn.execute("""
+              INSERT OR REPLACE INTO responses
+                (url, status, headers, body, etag, last_modified, size, stored, last_used)
+              VALUES(?,?,?,?,?,?,?,?,?)
+            """, (
+                url, resp.status_code, json.dumps(headers), body,
+                resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                len(body), now, now,
+            ))
+            self.total += len(body) - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                self.evict_locked()
+
+    def evict_locked(self):
+        target = self.max_bytes * EVICT_TO
+        cur = self.conn.execute("SELECT url, size FROM responses ORDER BY last_used")
+        drop = []
+        for url, size in cur:
+            if self.total <= target:
+                break
+            drop.append((url,))
+            self.total -= size
+        cur.close()
+        self.conn.executemany("DELETE FROM responses WHERE url = ?", drop)
+        log.info("[cache] Evicted %s responses", len(drop))
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+        self.total = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits, "revalidated": self.revalidated,
+            "misses": self.misses, "bytes": self.total,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
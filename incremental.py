@@ -0,0 +1,99 @@
+import hashlib
+import json
+import time
+
+STOP_AFTER_KNOWN_PAGES = 3
+FULL_SWEEP_INTERVAL = 24 * 60 * 60
+
+# API fields that end up in a record; a change in any of them means the
+# listing has to be processed again.
+FINGERPRINT_FIELDS = [
+    "url", "fullAddress", "price", "beds", "baths", "size", "lotSizeSqft",
+    "yearBuilt", "cozyingPropertyType", "propertyType", "propertyStatus",
+    "agent", "agentOffice", "agentId", "officeId",
+]
+
+
+def fingerprint(home):
+    fields = {key: home.get(key) for key in FINGERPRINT_FIELDS}
+    blob = json.dumps(fields, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+class SeenListings:
+    # Remembers the fingerprint of every listing we have processed. The API
+    # is sorted newest first, so once STOP_AFTER_KNOWN_PAGES pages in a row
+    # contain nothing new the rest of the catalogue is already known. A full
+    # sweep (no skipping, no early stop) runs when asked for or when the
+    # last one is older than FULL_SWEEP_INTERVAL.
+    def __init__(self, conn, writer, type, full=False,
+                 stop_after=STOP_AFTER_KNOWN_PAGES,
+                 full_sweep_interval=FULL_SWEEP_INTERVAL):
+        self.conn = conn
+        self.writer = writer
+        self.type = type
+        self.stop_after = stop_after
+        self.known_pages = 0
+
+        cur = conn.cursor()
+        cur.execute("""
+          CREATE TABLE IF NOT EXISTS seen_listings (
+            link        TEXT PRIMARY KEY,
+            type        TEXT,
+            fingerprint TEXT,
+            last_seen   REAL
+          )
+        """)
+        cur.execute("""
+          CREATE TABLE IF NOT EXISTS crawl_sweeps (
+            type     TEXT PRIMARY KEY,
+            started  REAL,
+            finished REAL
+          )
+        """)
+        columns = {row[1] for row in cur.execute("PRAGMA table_info(crawl_sweeps)")}
+        if "started" not in columns:
+            cur.execute("ALTER TABLE crawl_sweeps ADD COLUMN started REAL")
+        conn.commit()
+
+        cur.execute("SELECT link, fingerprint FROM seen_listings WHERE type = ?", (type,))
+        self.fingerprints = dict(cur.fetchall())
+        cur.execute("SELECT finished, started FROM crawl_sweeps WHERE type = ?", (type,))
+        row = cur.fetchone()
+        cur.close()
+
+        self.full = full or row is None or time.time() - row[0] >= full_sweep_interval
+        self.swept = row[1] if row else None
+
+    def unchanged(self, link, fp):
+        return not self.full and self.fingerprints.get(link) == fp
+
+    def mark(self, link, fp):
+        self.fingerprints[link] = fp
+        self.writer.add("""
+          INSERT INTO seen_listings(link, type, fingerprint, last_seen)
+          VALUES(?,?,?,?)
+          ON CONFLICT(link) DO UPDATE SET
+            fingerprint = excluded.fingerprint,
+            last_seen   = excluded.last_seen
+        """, (link, self.type, fp, time.time()))
+
+    def page_done(self, all_known):
+        # Returns True when paging should stop.
+        if self.full:
+            return False
+        self.known_pages = self.known_pages + 1 if all_known else 0
+        return self.known_pages >= self.stop_after
+
+    def export_since(self, started):
+        # A partial run only visits the newest listings; everything else was
+        # last seen by the previous full sweep, so export from its start.
+        if self.full:
+            return started
+        return self.swept or 0
+
+    def finish(self, started):
+        if self.full:
+            self.writer.add("""
+              INSERT OR REPLACE INTO crawl_sweeps(type, started, finished) VALUES(?,?,?)
+            """, (self.type, started, time.time()))
@@ -0,0 +1,42 @@
+import itertools
+import logging
+import logging.handlers
+import sys
+
+# Console logging for the scrapers. Output is buffered (flushed every
+# BUFFER records, on warnings and by the metrics reporter) so a fast crawl
+# is not held up by the terminal, and per-record lines, logged with
+# extra={"sample": True}, only show one in every SAMPLE_EVERY at INFO.
+# --log-level debug shows all of them.
+BUFFER = 200
+SAMPLE_EVERY = 100
+FORMAT = "%(message)s"
+
+
+class SampleFilter(logging.Filter):
+    def __init__(self, every=SAMPLE_EVERY):
+        super().__init__()
+        self.every = max(1, every)
+        self.seen = itertools.count()
+
+    def filter(self, record):
+        if not getattr(record, "sample", False) or record.levelno > logging.INFO:
+            return True
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            return True
+        return next(self.seen) % self.every == 0
+
+
+def setup(level="info", sample_every=SAMPLE_EVERY, buffer=BUFFER):
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter(FORMAT))
+    handler = logging.handlers.MemoryHandler(buffer, flushLevel=logging.WARNING,
+                                             target=stream)
+    handler.addFilter(SampleFilter(sample_every))
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    return handler
@@ -1,25 +1,107 @@
+import argparse
+import logging
+import multiprocessing
 import time
 from datetime import timedelta
 
-SCRAPE_PARCEL = False
+log = logging.getLogger("main")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Scrape cozying.ai listings")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip unchanged listings and stop paging at known ones")
+    parser.add_argument("--full", action="store_true",
+                        help="with --incremental, force a full sweep this run")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the last checkpoint instead of starting over")
+    parser.add_argument("--format", choices=["xlsx", "csv", "parquet"], default="xlsx",
+                        help="export file format")
+    parser.add_argument("--parcel", action="store_true", default=None,
+                        help="request scrapers: also scrape parcel numbers from the detail pages (main.py asks when neither this nor --no-parcel is given)")
+    parser.add_argument("--no-parcel", dest="parcel", action="store_false",
+                        help="do not scrape parcel numbers")
+    parser.add_argument("--fast", action="store_true",
+                        help="Playwright crawlers: run headless and skip images, fonts, CSS and third-party requests")
+    parser.add_argument("--capture-json", action="store_true",
+                        help="Playwright crawlers: take listings from the search page's API responses")
+    parser.add_argument("--http-details", action="store_true",
+                        help="Playwright crawlers: fetch detail pages over HTTP, render only when needed")
+    parser.add_argument("--cache", nargs="?", const="http_cache.db", default=None, metavar="PATH",
+                        help="keep HTTP responses in an on-disk cache and revalidate them on later runs")
+    parser.add_argument("--cache-size", type=int, default=512, metavar="MB",
+                        help="with --cache, evict least recently used responses past this size")
+    parser.add_argument("--offline", action="store_true",
+                        help="replay responses from the cache only, never touch the network")
+    parser.add_argument("--log-level", choices=["debug", "info", "warning"], default="info",
+                        help="debug also prints every scraped record")
+    parser.add_argument("--log-sample", type=int, default=100, metavar="N",
+                        help="at info level print one scraped record in every N")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="dump stage metrics to PATH.json and PATH.prom (Prometheus textfile)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, metavar="SECS",
+                        help="how often to log the rate summary and dump metrics")
+    parser.add_argument("--profile", nargs="?", const="profile", default=None, metavar="DIR",
+                        help="profile each stage (API paging, detail fetch, parse, SQLite write, export) into DIR")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile, also trace allocations with tracemalloc")
+    parser.add_argument("--profile-sample-only", action="store_true",
+                        help="with --profile, skip cProfile and only sample stacks (lower overhead)")
+    parser.add_argument("--profile-top", type=int, default=25, metavar="N",
+                        help="entries in the per-stage and allocation reports")
+    return parser
+
+
+def parse_args(argv=None):
+    return build_parser().parse_args(argv)
+
+
+def configure(args):
+    # logging, metrics and the shared HTTP layer; --offline implies the
+    # default cache
+    import logs
+    import metrics
+    logs.setup(args.log_level, args.log_sample)
+    metrics.start(args.metrics, args.metrics_interval)
+    if args.profile:
+        import profiling
+        profiling.start(args.profile, cprofile=not args.profile_sample_only,
+                        memory=args.profile_memory, top=args.profile_top)
+
+    if args.cache or args.offline:
+        import client
+        client.enable_cache(args.cache or "http_cache.db",
+                            max_bytes=args.cache_size * 1024 * 1024,
+                            offline=args.offline)
+
 
 def main():
-    global SCRAPE_PARCEL
-    scrape_parcel = input("Do you want to scrape parcel number? (Y/N)")
-    if "y" in scrape_parcel.lower():
-        SCRAPE_PARCEL = True
-        print("Scraping parcel number too")
-    elif "n" in scrape_parcel.lower():
-        SCRAPE_PARCEL = False
-        print("Will not scrape parcel number")
+    args = parse_args()
+    configure(args)
+    parcel = args.parcel
+    if parcel is None:
+        parcel = False
+        scrape_parcel = input("Do you want to scrape parcel number? (Y/N)")
+        if "y" in scrape_parcel.lower():
+            parcel = True
+            print("Scraping parcel number too")
+        elif "n" in scrape_parcel.lower():
+            print("Will not scrape parcel number")
 
     import reqsell
-    reqsell.main()
+    reqsell.main(incremental=args.incremental, full=args.full,
+                 resume=args.resume, fmt=args.format, parcel=parcel)
     import reqrent
-    reqrent.main()
+    reqrent.main(incremental=args.incremental, full=args.full,
+                 resume=args.resume, fmt=args.format, parcel=parcel)
+
+    import client
+    client.close()
 
 if __name__ == "__main__":
+    # parser processes of the detail pipeline need this in the frozen .exe
+    multiprocessing.freeze_support()
     start = time.perf_counter()
     main()
     end = time.perf_counter()
-    print("Code Ran For:", timedelta(seconds=(end - start)))
\ No newline at end of file
+    log.info("Code Ran For: %s", timedelta(seconds=(end - start)))
\ No newline at end of file
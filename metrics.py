@@ -0,0 +1,180 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import profiling
+
+# Counters and latency histograms for the scraper stages. Everything is
+# process-wide and thread-safe; start() adds a background thread that logs
+# a rate summary and dumps the numbers as JSON and in the Prometheus
+# textfile format every `interval` seconds (and once more at exit). Stage
+# histograms: api_fetch, detail_fetch, parse, db_write, export.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+INTERVAL = 10.0
+PREFIX = "cozying"
+
+log = logging.getLogger("metrics")
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_started = time.time()
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(stage, seconds):
+    with _lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = Histogram()
+        hist.observe(seconds)
+
+
+@contextmanager
+def timed(stage):
+    # also the unit --profile attributes cProfile data and samples to
+    start = time.perf_counter()
+    try:
+        with profiling.stage(stage):
+            yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "time": time.time(),
+            "uptime": time.time() - _started,
+            "counters": dict(_counters),
+            "histograms": {name: h.snapshot() for name, h in _histograms.items()},
+        }
+
+
+def prometheus(snap):
+    lines = []
+    for name, value in sorted(snap["counters"].items()):
+        metric = f"{PREFIX}_{name}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    metric = f"{PREFIX}_stage_seconds"
+    if snap["histograms"]:
+        lines.append(f"# TYPE {metric} histogram")
+    for stage, hist in sorted(snap["histograms"].items()):
+        cumulative = 0
+        for bound, n in hist["buckets"].items():
+            cumulative += n
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{stage="{stage}"}} {hist["sum"]}')
+        lines.append(f'{metric}_count{{stage="{stage}"}} {hist["count"]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_atomic(path, text):
+    # textfile collectors must never see a half-written file
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def dump(path):
+    snap = snapshot()
+    write_atomic(path + ".json", json.dumps(snap, indent=2))
+    write_atomic(path + ".prom", prometheus(snap))
+    return snap
+
+
+class Reporter:
+    def __init__(self, path=None, interval=INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.last = snapshot()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.report()
+
+    def report(self):
+        snap = dump(self.path) if self.path else snapshot()
+        elapsed = snap["time"] - self.last["time"] or 1e-9
+        rates = []
+        for name, value in sorted(snap["counters"].items()):
+            rate = (value - self.last["counters"].get(name, 0)) / elapsed
+            rates.append(f"{name}={value} ({rate:.1f}/s)")
+        stages = [
+            f"{stage} p50<={h['p50']:g}s p99<={h['p99']:g}s"
+            for stage, h in snap["histograms"].items()
+        ]
+        log.info("[metrics] %s", "  ".join(rates + stages))
+        self.last = snap
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+    def stop(self):
+        if not self.stop_event.is_set():
+            self.stop_event.set()
+            self.report()
+
+
+_reporter = None
+
+
+def start(path=None, interval=INTERVAL):
+    global _reporter
+    if _reporter is None:
+        _reporter = Reporter(path, interval)
+        _reporter.start()
+    return _reporter
@@ -0,0 +1,127 @@
+import html
+import re
+from bs4 import BeautifulSoup as bs
+
+# "scan" is a targeted regex scanner over the raw page, "lxml" uses lxml's
+# C parser when it is installed, "bs4" builds the full html.parser tree.
+# Fast backends return MISSING when they cannot find the Details block, and
+# extract_parcel then falls back to bs4 so the result is always the same.
+BACKEND = "scan"
+
+MISSING = object()
+
+DETAILS_RE = re.compile(
+    r"""<span\b[^>]*\bclass\s*=\s*["'](?:[^"']*\s)?item-title(?:\s[^"']*)?["'][^>]*>Details</span\s*>""",
+    re.I,
+)
+UL_RE = re.compile(r"<(/?)ul\b[^>]*>", re.I)
+TAG_NAME_RE = re.compile(r"<(/?)([a-z][a-z0-9:-]*)\b[^>]*?(/?)>", re.I)
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "source", "track", "wbr",
+}
+LI_RE = re.compile(r"<li\b[^>]*>(.*?)</li\s*>", re.I | re.S)
+TAG_RE = re.compile(r"<[^>]*>")
+
+
+def parse_parcel(soup):
+    details_label = soup.find("span", class_="item-title", string="Details")
+    if details_label:
+        # its next sibling <ul> contains the <li> items
+        ul = details_label.find_next_sibling("ul")
+        if ul:
+            for li in ul.find_all("li"):
+                text = li.get_text(strip=True)
+                if "Parcel Number:" in text:
+                    _, num = text.split(":", 1)
+                    return num.strip()
+    return None
+
+
+def parcel_bs4(text):
+    return parse_parcel(bs(text, "html.parser"))
+
+
+def parcel_scan(text):
+    label = DETAILS_RE.search(text)
+    if not label:
+        return MISSING
+
+    # bs4 takes the first <ul> that is a sibling of the label, so walk the
+    # tags after it keeping track of what is open: a <ul> with nothing open
+    # is that sibling, a closing tag with nothing open means the label's
+    # parent ended without one. Anything the walk cannot follow (mismatched
+    # tags) is left to bs4.
+    open_tags = []
+    for tag in TAG_NAME_RE.finditer(text, label.end()):
+        closing, name, self_closing = tag.group(1), tag.group(2).lower(), tag.group(3)
+        if closing:
+            if not open_tags or open_tags.pop() != name:
+                return MISSING
+        elif not open_tags and name == "ul":
+            break
+        elif name not in VOID_TAGS and not self_closing:
+            open_tags.append(name)
+    else:
+        return MISSING
+
+    # from that <ul> up to its matching </ul>
+    start = tag.end()
+    depth = 1
+    for tag in UL_RE.finditer(text, start):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            block = text[start:tag.start()]
+            break
+    else:
+        return MISSING
+
+    for li in LI_RE.finditer(block):
+        # same as bs4's get_text(strip=True): every text node stripped, joined
+        line = "".join(
+            html.unescape(part).strip() for part in TAG_RE.split(li.group(1))
+        )
+        if "Parcel Number:" in line:
+            _, num = line.split(":", 1)
+            return num.strip()
+    return None
+
+
+def parcel_lxml(text):
+    import lxml.html
+
+    doc = lxml.html.fromstring(text)
+    for span in doc.iter("span"):
+        classes = (span.get("class") or "").split()
+        if "item-title" in classes and len(span) == 0 and span.text == "Details":
+            break
+    else:
+        return MISSING
+
+    for sibling in span.itersiblings():
+        if sibling.tag == "ul":
+            for li in sibling.iter("li"):
+                line = "".join(part.strip() for part in li.itertext())
+                if "Parcel Number:" in line:
+                    _, num = line.split(":", 1)
+                    return num.strip()
+            return None
+    return None
+
+
+BACKENDS = {
+    "scan": parcel_scan,
+    "lxml": parcel_lxml,
+    "bs4": parcel_bs4,
+}
+
+
+def extract_parcel(text, backend=None):
+    backend = backend or BACKEND
+    if "Parcel Number" not in text:
+        return None
+
+    result = BACKENDS[backend](text)
+    if result is MISSING:
+        result = parcel_bs4(text)
+    return result
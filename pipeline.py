@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from bs4 import BeautifulSoup as bs
+import client
+import metrics
+import profiling
+from detail import parse_contact, contact_row
+from parcel import extract_parcel
+
+# Detail pages go through three separately sized stages: FETCH_WORKERS
+# threads download raw HTML, PARSE_WORKERS processes turn it into fields,
+# and the caller's loop (the writer stage) consumes the results in order.
+FETCH_WORKERS = 16
+PARSE_WORKERS = os.cpu_count() or 2
+
+
+def fetch_text(url):
+    with metrics.timed("detail_fetch"):
+        resp = client.get(url)
+    # An error page has no contact block; parsed, it would look like a
+    # listing without contacts and the resolver would remember the miss.
+    resp.raise_for_status()
+    return resp.text
+
+
+def parse_detail(text, sections, parcel):
+    # Runs in a parser process. Returns the fields and the time spent, for
+    # the parent's metrics.
+    start = time.perf_counter()
+    out = {}
+    if sections:
+        soup = bs(text, "html.parser")
+        for section in sections:
+            out[section] = contact_row(parse_contact(soup, section), section)
+    if parcel:
+        out["parcel_number"] = extract_parcel(text)
+    return out, time.perf_counter() - start
+
+
+def parse_detail_profiled(*args):
+    with profiling.stage("parse"):
+        return parse_detail(*args)
+
+
+class DetailPipeline:
+    def __init__(self, fetchers=FETCH_WORKERS, parsers=PARSE_WORKERS):
+        self.fetch_pool = ThreadPoolExecutor(max_workers=fetchers)
+        self.parsers = parsers
+        self.parse_pool = None
+        self.lock = threading.Lock()
+
+    def get_parse_pool(self):
+        # only start parser processes once something needs parsing. Under
+        # --profile parsing runs on threads so the profiler can see it.
+        with self.lock:
+            if self.parse_pool is None:
+                if profiling.active():
+                    self.parse_pool = ThreadPoolExecutor(max_workers=self.parsers)
+                else:
+                    self.parse_pool = ProcessPoolExecutor(max_workers=self.parsers)
+            return self.parse_pool
+
+    def submit(self, url, sections=(), parcel=False):
+        out = Future()
+
+        def parsed(future):
+            try:
+                fields, seconds = future.result()
+                metrics.observe("parse", seconds)
+                out.set_result(fields)
+            except Exception as e:
+                out.set_exception(e)
+
+        def fetched(future):
+            try:
+                text = future.result()
+                parse = parse_detail_profiled if profiling.active() else parse_detail
+                job = self.get_parse_pool().submit(
+                    parse, text, list(sections), parcel
+                )
+            except Exception as e:
+                out.set_exception(e)
+                return
+            job.add_done_callback(parsed)
+
+        self.fetch_pool.submit(fetch_text, url).add_done_callback(fetched)
+        return out
+
+    def close(self):
+        self.fetch_pool.shutdown(wait=True)
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,214 @@
+import atexit
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# --profile: every stage that metrics.timed wraps (api_fetch, detail_fetch,
+# parse, db_write, export) also runs under a per-stage cProfile, and a
+# sampler thread records which stack each thread is in while inside a
+# stage. At exit this writes, per stage, <stage>.pstats (snakeviz, pstats)
+# and <stage>.collapsed (flamegraph.pl / speedscope), plus allocations.txt
+# with the top-N allocation sites when tracemalloc is on.
+#
+# cProfile can only have one profiler per thread, so a nested stage pauses
+# the outer one; on Pythons where profilers are process-wide (3.12+) a
+# stage that starts while another thread is being profiled is only sampled.
+SAMPLE_INTERVAL = 0.005
+TOP_N = 25
+TRACE_FRAMES = 25
+
+log = logging.getLogger("profiling")
+
+_profiler = None
+
+
+class StageProfiler:
+    def __init__(self, outdir, cprofile=True, memory=False, top=TOP_N,
+                 interval=SAMPLE_INTERVAL):
+        self.outdir = outdir
+        self.cprofile = cprofile
+        self.memory = memory
+        self.top = top
+        self.interval = interval
+        self.lock = threading.Lock()
+        # (stage, thread id) -> cProfile.Profile
+        self.profiles = {}
+        # thread id -> stack of (stage, profile or None)
+        self.active = {}
+        self.samples = {}
+        self.calls = Counter()
+        self.skipped = Counter()
+        self.memory_delta = Counter()
+        self.stop_event = threading.Event()
+        self.sampler = threading.Thread(target=self.sample_loop, daemon=True)
+
+    def start(self):
+        os.makedirs(self.outdir, exist_ok=True)
+        if self.memory:
+            tracemalloc.start(TRACE_FRAMES)
+        self.sampler.start()
+        atexit.register(self.finish)
+
+    @contextmanager
+    def stage(self, name):
+        tid = threading.get_ident()
+        stack = self.active.setdefault(tid, [])
+        outer = stack[-1][1] if stack else None
+        profile = None
+        if self.cprofile:
+            if outer is not None:
+                outer.disable()
+            with self.lock:
+                profile = self.profiles.get((name, tid))
+                if profile is None:
+                    profile = self.profiles[(name, tid)] = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # another thread holds the process-wide profiler
+                profile = None
+                with self.lock:
+                    self.skipped[name] += 1
+        stack.append((name, profile))
+        with self.lock:
+            self.calls[name] += 1
+        before = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        try:
+            yield
+        finally:
+            if self.memory:
+                delta = tracemalloc.get_traced_memory()[0] - before
+                with self.lock:
+                    self.memory_delta[name] += delta
+            stack.pop()
+            if profile is not None:
+                profile.disable()
+            if outer is not None:
+                try:
+                    outer.enable()
+                except ValueError:
+                    pass
+
+    def sample_loop(self):
+        me = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for tid, stack in list(self.active.items()):
+                if tid == me or not stack or tid not in frames:
+                    continue
+                stage = stack[-1][0]
+                key = collapse(frames[tid])
+                counts = self.samples.setdefault(stage, Counter())
+                counts[key] += 1
+
+    def finish(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.sampler.join()
+
+        written = []
+        # before the reports below allocate anything
+        if self.memory:
+            written.append(self.write_allocations())
+            tracemalloc.stop()
+
+        stages = sorted(set(self.calls))
+        for stage in stages:
+            profiles = [p for (s, _), p in self.profiles.items() if s == stage]
+            stats = None
+            for profile in profiles:
+                profile.create_stats()
+                if not profile.stats:
+                    continue
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            if stats is not None:
+                path = os.path.join(self.outdir, f"{stage}.pstats")
+                stats.dump_stats(path)
+                written.append(path)
+
+            samples = self.samples.get(stage)
+            if samples:
+                path = os.path.join(self.outdir, f"{stage}.collapsed")
+                with open(path, "w") as f:
+                    for stack, n in samples.most_common():
+                        f.write(f"{stack} {n}\n")
+                written.append(path)
+
+        summary = os.path.join(self.outdir, "stages.txt")
+        with open(summary, "w") as f:
+            for stage in stages:
+                f.write(f"{stage}: {self.calls[stage]} calls, "
+                        f"{sum(self.samples.get(stage, {}).values())} samples, "
+                        f"{self.skipped[stage]} not under cProfile")
+                if self.memory:
+                    f.write(f", {self.memory_delta[stage] / 2 ** 20:+.1f} MiB traced memory change (approximate with threads)")
+                f.write("\n")
+                if self.cprofile:
+                    path = os.path.join(self.outdir, f"{stage}.pstats")
+                    if os.path.exists(path):
+                        pstats.Stats(path, stream=f).sort_stats("cumulative").print_stats(self.top)
+        written.append(summary)
+
+        log.info("[profile] Wrote %s", ", ".join(written))
+
+    def write_allocations(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        path = os.path.join(self.outdir, "allocations.txt")
+        with open(path, "w") as f:
+            f.write(f"traced memory: current {current / 2 ** 20:.1f} MiB, "
+                    f"peak {peak / 2 ** 20:.1f} MiB\n\n")
+            f.write(f"Top {self.top} allocation sites by line:\n")
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                f.write(f"  {stat}\n")
+            f.write(f"\nTop {self.top} allocation tracebacks:\n")
+            for stat in snapshot.statistics("traceback")[:self.top]:
+                f.write(f"\n{stat.count} blocks, {stat.size / 1024:.1f} KiB\n")
+                for line in stat.traceback.format(limit=10):
+                    f.write(f"  {line}\n")
+        return path
+
+
+def collapse(frame):
+    # root-first "file:function;file:function" as flamegraph.pl expects
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def start(outdir, cprofile=True, memory=False, top=TOP_N):
+    global _profiler
+    if _profiler is None:
+        _profiler = StageProfiler(outdir, cprofile, memory, top)
+        _profiler.start()
+    return _profiler
+
+
+def active():
+    return _profiler is not None
+
+
+@contextmanager
+def stage(name):
+    if _profiler is None:
+        yield
+    else:
+        with _profiler.stage(name):
+            yield
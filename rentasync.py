@@ -1,100 +1,71 @@
 import asyncio
-import pandas as pd
+import logging
 import time
-import sqlite3
-from playwright.async_api import async_playwright
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from dbwriter import BatchWriter
+from checkpoint import Checkpoint
+import schema
+from browser import (
+    EXTRACT_JS, new_context, PagePool, visit,
+    PageProgress, wait_for_list_change, ListingCapture, LIST_CHANGED_JS,
+)
+from homelist import BASE_URL
+from extractor import SELECTORS, build_record, empty_record, fetch_record
+from main import parse_args, configure
+from resolver import Resolver
+import metrics
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 
-URL = "https://cozying.ai/los-angeles-ca/rent?page=1"
+URL = BASE_URL + "/los-angeles-ca/rent?page=1"
+ONE_SHOT = True
+FAST_MODE = False
+CAPTURE_JSON = False
+# fetch detail pages over plain HTTP and only render them in the browser
+# when the listing is not in the server HTML
+HTTP_DETAILS = False
+# with CAPTURE_JSON, listings complete in the list-API JSON are saved without
+# rendering their page, which leaves parcel_number empty unless this is set
+CAPTURE_NEEDS_PARCEL = False
+# The list API hands the request scrapers agent/office ids and a status
+# that detail pages do not have, so the same listing would be stored with
+# different contact ids; the browser crawlers keep their own database.
+DB_PATH = "properties.db"
+KIND = "rent"
+TYPE_KEY = "propertyType"
+# Upper bound on tabs/detail workers; how many requests are actually in
+# flight is decided by the shared throttle limiter (see throttle.py).
 MAX_CONCURRENCY = 10
+QUEUE_SIZE = MAX_CONCURRENCY * 4
+# clicks on Next before paging gives up on a results list that does not change
+NEXT_ATTEMPTS = 2
+
+log = logging.getLogger("rentasync")
 
 conn = None
-cur = None
+writer = None
+store = None
+ckpt = None
 
 def insert_sql(res):
-    global conn, cur
-    insert_sql = """
-        INSERT OR REPLACE INTO listings (
-            link, street, zip, price, beds, baths, sf1, sf2, year,
-            property_and_building_type,
-            listing_provided_agent_name, listing_provided_agent_email, listing_provided_agent_number,
-            listing_provided_office_name, listing_provided_office_email, listing_provided_office_number,
-            parcel_number
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """
-    cur.execute(insert_sql, (
-        res["link"],
-        res["street"],
-        res["zip"],
-        res["price"],
-        res["beds"],
-        res["baths"],
-        res["sf1"],
-        res["sf2"],
-        res["year"],
-        res["property_and_building_type"],
-        res["listing_provided_agent_name"],
-        res["listing_provided_agent_email"],
-        res["listing_provided_agent_number"],
-        res["listing_provided_office_name"],
-        res["listing_provided_office_email"],
-        res["listing_provided_office_number"],
-        res["parcel_number"],
-    ))
-    conn.commit()
-
-
-def init_db():
-    global conn, cur
-    conn = sqlite3.connect("properties-rent.db")
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS listings (
-        link TEXT PRIMARY KEY,
-        street TEXT,
-        zip TEXT,
-        price INTEGER,
-        beds INTEGER,
-        baths INTEGER,
-        sf1 INTEGER,
-        sf2 INTEGER,
-        year INTEGER,
-        property_and_building_type TEXT,
-        listing_provided_agent_name TEXT,
-        listing_provided_agent_email TEXT,
-        listing_provided_agent_number TEXT,
-        listing_provided_office_name TEXT,
-        listing_provided_office_email TEXT,
-        listing_provided_office_number TEXT,
-        parcel_number TEXT
-    )
-    """)
-    conn.commit()
+    metrics.count("listings")
+    store.save(res)
 
 
-async def scrape_page(page):
-    print(f"[scrape_page] Opening: {page.url}")
-    res = {
-        "link": page.url,
-        "street": "",
-        "zip": "",
-        "price": 0,
-        "beds": 0,
-        "baths": 0,
-        "sf1": 0,
-        "sf2": 0,
-        "year": 0,
-        "property_and_building_type": "",
-        "listing_provided_agent_name": "",
-        "listing_provided_agent_email": "",
-        "listing_provided_agent_number": "",
-        "listing_provided_office_name": "",
-        "listing_provided_office_email": "",
-        "listing_provided_office_number": "",
-        "parcel_number": "",
-    }
+def page_url(url, page_idx):
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query["page"] = str(page_idx)
+    return urlunsplit(parts._replace(query=urlencode(query)))
 
-    await page.wait_for_selector("article.summary", timeout=60_000)
 
+def init_db(since=None):
+    global conn, writer, store
+    conn = schema.init_db(DB_PATH)
+    writer = BatchWriter(conn)
+    store = schema.ListingStore(conn, writer, KIND, since)
+
+
+async def read_locators(page, res):
     # Street & ZIP
     street = await page.locator("article.summary p.summary__address").inner_text()
     res["street"] = street.strip()
@@ -179,81 +150,207 @@ async def scrape_page(page):
                     if num.isdigit():
                         res["parcel_number"] = num
 
+
+async def scrape_page(page):
+    log.debug("[scrape_page] Opening: %s", page.url)
+    await page.wait_for_selector("article.summary", timeout=60_000)
+
+    start = time.perf_counter()
+    if ONE_SHOT:
+        res = build_record(page.url, await page.evaluate(EXTRACT_JS, SELECTORS))
+    else:
+        res = empty_record(page.url)
+        await read_locators(page, res)
+    metrics.observe("parse", time.perf_counter() - start)
+
     insert_sql(res)
-    print(res)
+    log.info("%s", res, extra={"sample": True})
+    return res
+
+
+async def fetch_detail_http(url, idx):
+    log.debug("[fetch_detail] (%s) Fetching %s", idx, url)
+    try:
+        res = await asyncio.get_running_loop().run_in_executor(None, fetch_record, url)
+    except Exception as e:
+        log.warning("[fetch_detail] HTTP fetch failed, using the browser: %s", e)
+        return None
+    if res:
+        insert_sql(res)
+        log.info("%s", res, extra={"sample": True})
+        ckpt.done(url)
     return res
 
 
-async def fetch_detail(context, url, sem, idx):
-    async with sem:
-        print(f"[fetch_detail] ({idx}) Visiting {url}")
-        page = await context.new_page()
+async def fetch_detail(pool, url, idx, capture=None):
+    if HTTP_DETAILS:
+        res = await fetch_detail_http(url, idx)
+        if res:
+            if capture:
+                capture.learn(url, res)
+            return res
+
+    page = await pool.acquire()
+    broken = True
+    try:
+        log.debug("[fetch_detail] (%s) Visiting %s", idx, url)
+        # scrape_page waits for article.summary, so in fast mode there
+        # is no need to wait for the full load event
+        await visit(page, url, wait_until="commit" if FAST_MODE else "load")
+        res = await scrape_page(page)
+        ckpt.done(url)
+        broken = False
+        if capture:
+            capture.learn(url, res)
+        return res
+    finally:
+        await pool.release(page, broken)
+
+
+async def detail_worker(pool, queue, progress, capture=None):
+    while True:
+        item = await queue.get()
+        if item is None:
+            break
+        page_idx, idx, url = item
+        ok = False
         try:
-            await page.goto(url)
-            return await scrape_page(page)
+            await fetch_detail(pool, url, idx, capture)
+            ok = True
+        except Exception as e:
+            metrics.count("errors")
+            log.warning("[main] Error scraping detail: %s", e)
         finally:
-            await page.close()
-
-
-async def main():
-    init_db()
-    sem = asyncio.Semaphore(MAX_CONCURRENCY)
-    async with async_playwright() as pw:
-        browser = await pw.chromium.launch(headless=False)
-        context = await browser.new_context()
-        page = await context.new_page()
-        await page.goto(URL)
-        all_results = []
-        page.wait_for_load_state("networkidle", timeout=60_000)
-        time.sleep(15)
-        remove_boundary_button = page.locator("button.remove-boundary-btn")
-        remove_boundary_button.click()
-
-        page_idx = 1
-        while True:
-            print(f"[main] On results page #{page_idx}")
-            await page.wait_for_selector("div.search-result__list a", timeout=60_000)
-            hrefs = await page.eval_on_selector_all(
-                "div.search-result__list a",
-                "els => els.map(e => e.getAttribute('href'))"
-            )
-
-            tasks = []
-            new_context = await browser.new_context()
-            for i, href in enumerate(hrefs):
-                if not href:
-                    continue
-                if "https" in href:
-                    continue
-                full = f"https://cozying.ai{href}"
-                tasks.append(
-                    asyncio.create_task(fetch_detail(new_context, full, sem, i))
-                )
-
-            # gather and print errors
-            for result in await asyncio.gather(*tasks, return_exceptions=True):
-                if isinstance(result, Exception):
-                    print("[main] Error scraping detail:", result)
-                else:
-                    all_results.append(result)
-
-            # Next page?
-            next_btn = page.locator("nav.pagination li.pagination__nav").nth(-1)
-            classes = (await next_btn.get_attribute("class")) or ""
-            if "link-disabled" in classes:
-                print("[main] No more pages—exiting loop.")
-                break
-
-            print("[main] Clicking Next →")
-            await next_btn.click()
-            await page.wait_for_timeout(6000)
-            page_idx += 1
-
-        await browser.close()
-
-    df = pd.read_sql_query("SELECT * FROM listings", conn)
-    conn.close()
-    df.to_excel("properties-sell.xlsx", index=False)
+            progress.done(page_idx, ok)
+
+
+def finish_page(next_page):
+    writer.flush()
+    ckpt.page_finished(next_page)
+
+
+async def click_next(page, next_btn, prev_first, attempts=NEXT_ATTEMPTS):
+    # True once the results list re-rendered after clicking Next. A click
+    # that did not take is tried again; False means paging stops here.
+    for attempt in range(1, attempts + 1):
+        try:
+            await next_btn.click(timeout=15_000)
+            await wait_for_list_change(page, prev_first)
+            return True
+        except PlaywrightTimeoutError:
+            # the list may have changed right after the wait gave up
+            if await page.evaluate(LIST_CHANGED_JS, prev_first):
+                return True
+            log.warning("[main] Next did not load new results (attempt %s)", attempt)
+    return False
+
+
+async def main(resume=False, fmt="xlsx", fast=FAST_MODE, capture=CAPTURE_JSON,
+               http_details=HTTP_DETAILS):
+    global ckpt, FAST_MODE, HTTP_DETAILS
+    FAST_MODE = fast
+    HTTP_DETAILS = http_details
+    ckpt = Checkpoint("rentasync", resume)
+    init_db(ckpt.started)
+    page_idx = ckpt.start_page(1)
+    progress = PageProgress(page_idx, finish_page)
+    complete = False
+    try:
+        async with async_playwright() as pw:
+            browser = await pw.chromium.launch(headless=fast)
+            context = await new_context(browser, fast)
+            page = await context.new_page()
+            capture = (ListingCapture(TYPE_KEY, CAPTURE_NEEDS_PARCEL, Resolver(conn, writer))
+                       if capture else None)
+            if capture:
+                capture.attach(page)
+            pool = PagePool(await new_context(browser, fast), MAX_CONCURRENCY)
+            await pool.start()
+
+            # The walker below only pushes hrefs; detail workers drain the queue
+            # continuously, so they keep working while we page through results.
+            queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+            workers = [
+                asyncio.create_task(detail_worker(pool, queue, progress, capture))
+                for _ in range(MAX_CONCURRENCY)
+            ]
+
+            try:
+                await page.goto(page_url(URL, page_idx))
+                await page.wait_for_selector("div.search-result__list a", timeout=60_000)
+                first = await page.get_attribute("div.search-result__list a", "href")
+                try:
+                    await page.locator("button.remove-boundary-btn").click(timeout=15_000)
+                    await wait_for_list_change(page, first)
+                except PlaywrightTimeoutError:
+                    log.info("[main] Boundary not removed, continuing with current results")
+
+                while True:
+                    log.info("[main] On results page #%s", page_idx)
+                    await page.wait_for_selector("div.search-result__list a", timeout=60_000)
+                    hrefs = await page.eval_on_selector_all(
+                        "div.search-result__list a",
+                        "els => els.map(e => e.getAttribute('href'))"
+                    )
+
+                    urls = []
+                    for i, href in enumerate(hrefs):
+                        if not href:
+                            continue
+                        if "https" in href:
+                            continue
+                        full = BASE_URL + href
+                        if ckpt.is_done(full):
+                            continue
+                        res = capture.record(full) if capture else None
+                        if res:
+                            insert_sql(res)
+                            ckpt.done(full)
+                            log.info("%s", res, extra={"sample": True})
+                            continue
+                        urls.append((i, full))
+
+                    progress.add(page_idx, len(urls))
+                    for i, full in urls:
+                        await queue.put((page_idx, i, full))
+
+                    # Next page?
+                    next_btn = page.locator("nav.pagination li.pagination__nav").nth(-1)
+                    classes = (await next_btn.get_attribute("class")) or ""
+                    if "link-disabled" in classes:
+                        log.info("[main] No more pages—exiting loop.")
+                        complete = True
+                        break
+
+                    log.debug("[main] Clicking Next →")
+                    if not await click_next(page, next_btn, hrefs[0] if hrefs else None):
+                        log.warning("[main] Results did not change, stopping at page %s", page_idx)
+                        break
+                    page_idx += 1
+            finally:
+                # however paging ended, the workers finish what was queued
+                for _ in workers:
+                    await queue.put(None)
+                await asyncio.gather(*workers)
+
+                await pool.close()
+                await browser.close()
+    finally:
+        writer.close()
+        schema.export(conn, KIND, f"properties-rent.{fmt}", ckpt.started)
+        conn.close()
+        if complete and not progress.failed:
+            ckpt.clear()
+        else:
+            # keep the checkpoint so --resume retries failed listings and
+            # walks the pages this run did not get to
+            log.warning("[main] Run incomplete (failed listings on pages %s), "
+                        "--resume continues from page %s",
+                        sorted(progress.failed), ckpt.start_page(1))
+        ckpt.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    configure(args)
+    asyncio.run(main(resume=args.resume, fmt=args.format, fast=args.fast,
+                     capture=args.capture_json, http_details=args.http_details))
@@ -1,199 +1,162 @@
-import requests
-from bs4 import BeautifulSoup as bs
-import sqlite3
-import pandas as pd
+import logging
 import time
 from datetime import timedelta
-from main import SCRAPE_PARCEL
-
-
-def init_db():
-    conn = sqlite3.connect("agents_and_offices.db")
-    cur = conn.cursor()
-    return conn, cur
-
-
-def find_agent(cur, id):
-    cur.execute("""
-        SELECT name, email, phone
-          FROM agents
-         WHERE agentId = ?
-    """, (id,))
-    row = cur.fetchone()
-
-    return row
-
-
-def find_office(cur, id):
-    cur.execute("""
-        SELECT name, email, phone
-          FROM offices
-         WHERE officeId = ?
-    """, (id,))
-    row = cur.fetchone()
-
-    return row
-
-
-def main():
+from main import parse_args, configure
+from homelist import BASE_URL, iter_pages, home_record
+from pipeline import DetailPipeline
+from resolver import Resolver
+from dbwriter import BatchWriter
+from reqsell import init_db
+from incremental import SeenListings, fingerprint
+from checkpoint import Checkpoint
+from records import Listing
+import schema
+import metrics
+
+log = logging.getLogger("reqrent")
+
+
+def resolve_contact(resolver, section, id, parsed):
+    # The contact comes from this listing's own detail page or from the
+    # resolver, never from a second download. A listing whose page failed
+    # (or whose agent/office was asked for by a listing whose page failed)
+    # is saved with the id only; nothing is remembered as a miss, so the next
+    # listing of the same agent/office asks again and the export joins the
+    # contact in once it is known.
+    if section in parsed:
+        return resolver.resolve(section, id, lambda: parsed[section])
+    return resolver.lookup(section, id)
+
+
+def scrape_page(homes, store, details, resolver, ckpt=None, seen=None, scraped=0, parcel=False):
+    # One API page of rent homes into the store. Returns the running
+    # scraped count and how many homes --incremental found unchanged.
+    resolver.prefetch("agent", [home.get("agentId", "") for home in homes])
+    resolver.prefetch("office", [home.get("officeId", "") for home in homes])
+    known = 0
+    jobs = []
+    requested = {"agent": set(), "office": set()}
+    for home in homes:
+        link = BASE_URL + home.get("url", "")
+        if ckpt and ckpt.is_done(link):
+            continue
+        fp = None
+        if seen:
+            fp = fingerprint(home)
+            if seen.unchanged(link, fp):
+                known += 1
+                continue
+
+        rec = Listing(home_record(home, "propertyType"))
+        ids = {"agent": home.get("agentId", ""), "office": home.get("officeId", "")}
+
+        # Only the first home of an unknown agent/office on this page
+        # asks for it; the ones after it read it back from the resolver.
+        sections = []
+        for section, id in ids.items():
+            if id not in requested[section] and resolver.needs_fetch(section, id):
+                requested[section].add(id)
+                sections.append(section)
+
+        future = None
+        if sections or parcel:
+            future = details.submit(rec["link"], sections, parcel)
+        jobs.append((rec, ids, home.get("propertyStatus"), future, fp))
+
+    for rec, ids, status, future, fp in jobs:
+        parsed = {}
+        if future:
+            try:
+                parsed = future.result()
+            except Exception as e:
+                # contacts and the parcel number stay empty, the page is
+                # not fetched again
+                metrics.count("errors")
+                if parcel:
+                    metrics.count("parcel_error")
+                log.warning("[detail] Failed for %s: %s", rec["link"], e)
+
+        # agent info
+        agentRow = resolve_contact(resolver, "agent", ids["agent"], parsed)
+        officeRow = resolve_contact(resolver, "office", ids["office"], parsed)
+
+        # Is the agent known (from the database or a detail page)
+        if agentRow:
+            name, email, number = agentRow
+            rec.update({
+                "listing_provided_agent_name":   name,
+                "listing_provided_agent_email":  email,
+                "listing_provided_agent_number": number,
+            })
+
+        # is that office known
+        if officeRow:
+            name, email, number = officeRow
+            rec.update({
+                "listing_provided_office_name":   name,
+                "listing_provided_office_email":  email,
+                "listing_provided_office_number": number,
+            })
+
+        # parcel number
+        if "parcel_number" in parsed:
+            rec["parcel_number"] = parsed["parcel_number"]
+
+        store.save(rec, ids["agent"], ids["office"], status)
+        scraped += 1
+        metrics.count("listings")
+        log.info("%s scraped %s", scraped, rec, extra={"sample": True})
+        if seen:
+            seen.mark(rec["link"], fp)
+        if ckpt:
+            ckpt.done(rec["link"])
+
+    return scraped, known
+
+
+def main(incremental=False, full=False, resume=False, fmt="xlsx", parcel=False):
     conn, cur = init_db()
-    PAGE = 0
-    API_URL = f"https://cozying.ai/cozying-api/v1/home/list?currentPage={PAGE}&homesPerGroup=200&propertyStatus[]=active&sorted=newest&minPrice=0&maxPrice=0&minBeds=0&minBaths=0&hasOpenHouses=false&hasVirtualTour=false&type=rent"
-
-    results = []
-    response = requests.get(API_URL)
-    data = response.json()
-    homes = data.get("homes", [])
-
-    while homes:
-        print("[INFO] Scraping ", API_URL)
-        for home in homes:
-            full_addr = home.get("fullAddress", "")
-            street, *rest = full_addr.split(",")
-            rest = ", ".join(rest).strip()
-            zipcode = rest.split()[-1] if rest else ""
-
-            rec = {
-                "link":           "https://cozying.ai" + home.get("url", ""),
-                "street":         street.strip(),
-                "zip":            zipcode,
-                "price":          home.get("price", 0),
-                "beds":           home.get("beds") or 0,
-                "baths":          home.get("baths") or 0,
-                "sf1":            home.get("size", 0),
-                "sf2":            int(home.get("lotSizeSqft") or 0),
-                "year":           home.get("yearBuilt") or 0,
-                "property_and_building_type": home.get("propertyType", ""),
-            }
-
-            # agent info
-            agentId = home.get("agentId", "")
-            officeId = home.get("officeId", "")
-            agentRow = find_agent(cur, agentId)
-            officeRow = find_office(cur, officeId)
-
-            # Is the agent in our database
-            if agentRow:
-                name, email, number = agentRow
-                rec.update({
-                    "listing_provided_agent_name":   name,
-                    "listing_provided_agent_email":  email,
-                    "listing_provided_agent_number": number,
-                })
-            else:
-                resp = requests.get(rec["link"])
-                soup = bs(resp.text, "html.parser")
-                agent_div = soup.find("div", class_="listing-information__agent")
-                if agent_div:
-                    for li in agent_div.select("ul li"):
-                        text = li.get_text(strip=True).lstrip("• ").split(":", 1)
-                        if len(text) == 2:
-                            label, value = text
-                            label = label.strip().lower()
-                            value = value.strip()
-                            if label == "name":
-                                rec["listing_provided_agent_name"] = value
-                            elif label == "email":
-                                rec["listing_provided_agent_email"] = value
-                            elif label == "phone":
-                                rec["listing_provided_agent_number"] = value
-                        
-                    cur.execute("""
-                    INSERT OR IGNORE INTO agents(agentId,name,email,phone)
-                    VALUES(?,?,?,?)
-                    """, (
-                        agentId,
-                        rec["listing_provided_agent_name"],
-                        rec["listing_provided_agent_email"],
-                        rec["listing_provided_agent_number"],
-                    ))
-                    conn.commit()
-
-            # is that office in our database
-            if officeRow:
-                name, email, number = officeRow
-                rec.update({
-                    "listing_provided_office_name":   name,
-                    "listing_provided_office_email":  email,
-                    "listing_provided_office_number": number,
-                })
-            else:
-                resp = requests.get(rec["link"])
-                soup = bs(resp.text, "html.parser")
-                office_div = soup.find("div", class_="listing-information__office")
-                if office_div:
-                    for li in office_div.select("ul li"):
-                        text = li.get_text(strip=True).lstrip("• ").split(":", 1)
-                        if len(text) == 2:
-                            label, value = text
-                            label = label.strip().lower()
-                            value = value.strip()
-                            if label == "name":
-                                rec["listing_provided_office_name"] = value
-                            elif label == "email":
-                                rec["listing_provided_office_email"] = value
-                            elif label == "phone":
-                                rec["listing_provided_office_number"] = value
-                    cur.execute("""
-                    INSERT OR IGNORE INTO offices(officeId,name,email,phone)
-                    VALUES(?,?,?,?)
-                    """, (
-                        officeId,
-                        rec["listing_provided_office_name"],
-                        rec["listing_provided_office_email"],
-                        rec["listing_provided_office_number"],
-                    ))
-                    conn.commit()
-
-            # parcel number
-            if SCRAPE_PARCEL:
-                try:
-                    resp = requests.get(rec["link"])
-                    resp.raise_for_status()
-                    soup = bs(resp.text, "html.parser")
-                    details_label = soup.find(
-                        "span", class_="item-title", string="Details"
-                    )
-
-                    parcel_number = None
-                    if details_label:
-                        # 2) its next sibling <ul> contains the <li> items
-                        ul = details_label.find_next_sibling("ul")
-                        if ul:
-                            for li in ul.find_all("li"):
-                                text = li.get_text(strip=True)
-                                if "Parcel Number:" in text:
-                                    # 3) split off the number
-                                    _, num = text.split(":", 1)
-                                    parcel_number = num.strip()
-                                    break
-
-                    # store it on your record
-                    rec["parcel_number"] = parcel_number
-
-                except:
-                    pass
-
-            results.append(rec)
-            print(len(results), " scraped")
-            print(rec)
-
-        PAGE += 1
-        API_URL = f"https://cozying.ai/cozying-api/v1/home/list?currentPage={PAGE}&homesPerGroup=200&propertyStatus[]=active&sorted=newest&minPrice=0&maxPrice=0&minBeds=0&minBaths=0&hasOpenHouses=false&hasVirtualTour=false&type=rent"
-        response = requests.get(API_URL)
-        data = response.json()
-        homes = data.get("homes", [])
-
-    df = pd.DataFrame(results)
-    df.to_excel("homes-rent.xlsx", index=False)
-    print(len(results), " scraped")
-
+    details = DetailPipeline()
+    writer = BatchWriter(conn)
+    seen = SeenListings(conn, writer, "rent", full) if incremental else None
+    ckpt = Checkpoint("reqrent", resume)
+    resolver = Resolver(conn, writer)
+    store = schema.ListingStore(conn, writer, "rent", ckpt.started)
+    scraped = 0
+
+    for PAGE, API_URL, homes in iter_pages("rent", start=ckpt.start_page()):
+        log.info("[INFO] Scraping %s", API_URL)
+        scraped, known = scrape_page(homes, store, details, resolver,
+                                     ckpt, seen, scraped, parcel)
+        writer.flush()
+        ckpt.page_finished(PAGE + 1)
+
+        if seen and seen.page_done(known == len(homes)):
+            log.info("[INFO] Reached already-known listings, stopping at page %s", PAGE)
+            break
+
+    since = ckpt.started
+    if seen:
+        seen.finish(ckpt.started)
+        since = seen.export_since(ckpt.started)
+
+    writer.flush()
+    exported = schema.export(conn, "rent", f"homes-rent.{fmt}", since)
+    log.info("%s scraped, %s exported", scraped, exported)
+    ckpt.clear()
+    ckpt.close()
+
+    details.close()
+    writer.close()
     cur.close()
     conn.close()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    configure(args)
     start = time.perf_counter()
-    main()
+    main(incremental=args.incremental, full=args.full, resume=args.resume,
+         fmt=args.format, parcel=bool(args.parcel))
     end = time.perf_counter()
-    print("Code Ran For:", timedelta(seconds=(end - start)))
\ No newline at end of file
+    log.info("Code Ran For: %s", timedelta(seconds=(end - start)))
\ No newline at end of file
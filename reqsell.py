@@ -1,158 +1,131 @@
-import requests
-from bs4 import BeautifulSoup as bs
-import sqlite3
-import pandas as pd
+import logging
 import time
 from datetime import timedelta
-from main import SCRAPE_PARCEL
+from main import parse_args, configure
+from homelist import BASE_URL, iter_pages, home_record
+from pipeline import DetailPipeline
+from dbwriter import BatchWriter
+from incremental import SeenListings, fingerprint
+from checkpoint import Checkpoint
+from records import Listing
+import schema
+import metrics
 
-
-def init_db():
-    conn = sqlite3.connect("agents_and_offices.db")
-    cur = conn.cursor()
-    cur.execute("""
-      CREATE TABLE IF NOT EXISTS agents (
-        agentId TEXT PRIMARY KEY,
-        name    TEXT,
-        email   TEXT,
-        phone   TEXT
-      )
-    """)
-    cur.execute("""
-      CREATE TABLE IF NOT EXISTS offices (
-        officeId TEXT PRIMARY KEY,
-        name      TEXT,
-        email     TEXT,
-        phone     TEXT
-      )
-    """)
-    conn.commit()
-    return conn, cur
+log = logging.getLogger("reqsell")
 
 
-def main():
+def init_db():
+    conn = schema.init_db()
+    return conn, conn.cursor()
+
+
+def scrape_page(homes, store, details, ckpt=None, seen=None, scraped=0, parcel=False):
+    # One API page of sale homes into the store. Returns the running
+    # scraped count and how many homes --incremental found unchanged.
+    known = 0
+    jobs = []
+    for home in homes:
+        link = BASE_URL + home.get("url", "")
+        if ckpt and ckpt.is_done(link):
+            continue
+        fp = None
+        if seen:
+            fp = fingerprint(home)
+            if seen.unchanged(link, fp):
+                known += 1
+                continue
+
+        rec = Listing(home_record(home, "cozyingPropertyType"))
+
+        # agent info
+        agent = home.get("agent", {})
+        agentId = agent.get("agentId", "")
+        rec.update({
+            "listing_provided_agent_name":   agent.get("agentName", ""),
+            "listing_provided_agent_email":  agent.get("agentEmail", ""),
+            "listing_provided_agent_number": agent.get("agentPhone", ""),
+        })
+
+        # office info
+        office = home.get("agentOffice", {})
+        officeId = office.get("officeId", "")
+        rec.update({
+            "listing_provided_office_name":   office.get("officeName", ""),
+            "listing_provided_office_email":  office.get("officeEmail", ""),
+            "listing_provided_office_number": office.get("officePhone", ""),
+        })
+
+        future = details.submit(rec["link"], parcel=True) if parcel else None
+        jobs.append((rec, agentId, officeId, home.get("propertyStatus"), future, fp))
+
+    for rec, agentId, officeId, status, future, fp in jobs:
+        # parcel number
+        if future:
+            try:
+                parsed = future.result()
+                if "parcel_number" in parsed:
+                    rec["parcel_number"] = parsed["parcel_number"]
+            except Exception as e:
+                # error pages raise in the pipeline's fetch stage
+                metrics.count("errors")
+                metrics.count("parcel_error")
+                log.warning("[parcel] Failed for %s: %s", rec["link"], e)
+
+        store.save(rec, agentId, officeId, status)
+        scraped += 1
+        metrics.count("listings")
+        log.info("%s scraped %s", scraped, rec, extra={"sample": True})
+        if seen:
+            seen.mark(rec["link"], fp)
+        if ckpt:
+            ckpt.done(rec["link"])
+
+    return scraped, known
+
+
+def main(incremental=False, full=False, resume=False, fmt="xlsx", parcel=False):
     conn, cur = init_db()
-    PAGE = 0
-    API_URL = f"https://cozying.ai/cozying-api/v1/home/list?currentPage={PAGE}&homesPerGroup=200&propertyStatus[]=active&sorted=newest&minPrice=0&maxPrice=0&minBeds=0&minBaths=0&hasOpenHouses=false&hasVirtualTour=false&type=sale"
-
-    results = []
-    response = requests.get(API_URL)
-    data = response.json()
-    homes = data.get("homes", [])
-
-    while homes:
-        print("[INFO] Scraping ", API_URL)
-        print("homes len: ", len(homes))
-        for home in homes:
-            full_addr = home.get("fullAddress", "")
-            street, *rest = full_addr.split(",")
-            rest = ", ".join(rest).strip()
-            zipcode = rest.split()[-1] if rest else ""
-
-            rec = {
-                "link":           "https://cozying.ai" + home.get("url", ""),
-                "street":         street.strip(),
-                "zip":            zipcode,
-                "price":          home.get("price", 0),
-                "beds":           home.get("beds") or 0,
-                "baths":          home.get("baths") or 0,
-                "sf1":            home.get("size", 0),
-                "sf2":            int(home.get("lotSizeSqft") or 0),
-                "year":           home.get("yearBuilt") or 0,
-                "property_and_building_type": home.get("cozyingPropertyType", ""),
-            }
-
-            # agent info
-            agent = home.get("agent", {})
-            agentId = agent.get("agentId", "")
-            rec.update({
-                "listing_provided_agent_name":   agent.get("agentName", ""),
-                "listing_provided_agent_email":  agent.get("agentEmail", ""),
-                "listing_provided_agent_number": agent.get("agentPhone", ""),
-            })
-
-            # office info
-            office = home.get("agentOffice", {})
-            officeId = office.get("officeId", "")
-            rec.update({
-                "listing_provided_office_name":   office.get("officeName", ""),
-                "listing_provided_office_email":  office.get("officeEmail", ""),
-                "listing_provided_office_number": office.get("officePhone", ""),
-            })
-
-            # Save Agent to Database
-            cur.execute("""
-              INSERT OR IGNORE INTO agents(agentId,name,email,phone)
-              VALUES(?,?,?,?)
-            """, (
-              agentId,
-              agent.get("agentName",""),
-              agent.get("agentEmail",""),
-              agent.get("agentPhone","")
-            ))
-
-            # Save Office to Database
-            cur.execute("""
-              INSERT OR IGNORE INTO offices(officeId,name,email,phone)
-              VALUES(?,?,?,?)
-            """, (
-              officeId,
-              office.get("officeName",""),
-              office.get("officeEmail",""),
-              office.get("officePhone","")
-            ))
-            conn.commit()
-
-            # parcel number
-            if SCRAPE_PARCEL:
-                try:
-                    resp = requests.get(rec["link"])
-                    resp.raise_for_status()
-                    soup = bs(resp.text, "html.parser")
-                    details_label = soup.find(
-                        "span", class_="item-title", string="Details"
-                    )
-
-                    parcel_number = None
-                    if details_label:
-                        # 2) its next sibling <ul> contains the <li> items
-                        ul = details_label.find_next_sibling("ul")
-                        if ul:
-                            for li in ul.find_all("li"):
-                                text = li.get_text(strip=True)
-                                if "Parcel Number:" in text:
-                                    # 3) split off the number
-                                    _, num = text.split(":", 1)
-                                    parcel_number = num.strip()
-                                    break
-
-                    # store it on your record
-                    rec["parcel_number"] = parcel_number
-
-                except:
-                    pass
-
-            results.append(rec)
-            print(len(results), " scraped")
-            print(rec, "\n")
-
-        PAGE += 1
-        API_URL = f"https://cozying.ai/cozying-api/v1/home/list?currentPage={PAGE}&homesPerGroup=200&propertyStatus[]=active&sorted=newest&minPrice=0&maxPrice=0&minBeds=0&minBaths=0&hasOpenHouses=false&hasVirtualTour=false&type=sale"
-        response = requests.get(API_URL)
-        data = response.json()
-        homes = data.get("homes", [])
-
-    df = pd.DataFrame(results)
-    df.to_excel("homes-sell.xlsx", index=False)
-    print(len(results), " scraped")
-
+    writer = BatchWriter(conn)
+    details = DetailPipeline()
+    seen = SeenListings(conn, writer, "sale", full) if incremental else None
+    ckpt = Checkpoint("reqsell", resume)
+    store = schema.ListingStore(conn, writer, "sale", ckpt.started)
+    scraped = 0
+
+    for PAGE, API_URL, homes in iter_pages("sale", start=ckpt.start_page()):
+        log.info("[INFO] Scraping %s", API_URL)
+        log.debug("homes len: %s", len(homes))
+        scraped, known = scrape_page(homes, store, details, ckpt, seen, scraped, parcel)
+        writer.flush()
+        ckpt.page_finished(PAGE + 1)
+
+        if seen and seen.page_done(known == len(homes)):
+            log.info("[INFO] Reached already-known listings, stopping at page %s", PAGE)
+            break
+
+    since = ckpt.started
+    if seen:
+        seen.finish(ckpt.started)
+        since = seen.export_since(ckpt.started)
+
+    writer.flush()
+    exported = schema.export(conn, "sale", f"homes-sell.{fmt}", since)
+    log.info("%s scraped, %s exported", scraped, exported)
+    ckpt.clear()
+    ckpt.close()
+
+    details.close()
+    writer.close()
     conn.commit()
     cur.close()
     conn.close()
 
 
 if __name__ == "__main__":
+    args = parse_args()
+    configure(args)
     start = time.perf_counter()
-    main()
+    main(incremental=args.incremental, full=args.full, resume=args.resume,
+         fmt=args.format, parcel=bool(args.parcel))
     end = time.perf_counter()
-    print("Code Ran For:", timedelta(seconds=(end - start)))
\ No newline at end of file
+    log.info("Code Ran For: %s", timedelta(seconds=(end - start)))
\ No newline at end of file
@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import Future
+
+MISS_TTL = 6 * 60 * 60
+
+TABLES = {
+    "agent": ("agents", "agentId"),
+    "office": ("offices", "officeId"),
+}
+
+
+class Resolver:
+    # Keeps the agents and offices tables in memory so each home costs a
+    # dict lookup instead of a SELECT. IDs whose detail page had no contact
+    # block are remembered for MISS_TTL seconds so they are not fetched
+    # again, and concurrent resolves of the same ID share one fetch.
+    def __init__(self, conn, writer, miss_ttl=MISS_TTL):
+        self.conn = conn
+        self.writer = writer
+        self.miss_ttl = miss_ttl
+        self.lock = threading.Lock()
+        self.known = {section: {} for section in TABLES}
+        self.misses = {section: {} for section in TABLES}
+        self.inflight = {section: {} for section in TABLES}
+        self.load()
+
+    def load(self):
+        cur = self.conn.cursor()
+        for section, (table, key) in TABLES.items():
+            cur.execute(f"SELECT {key}, name, email, phone FROM {table}")
+            self.known[section] = {row[0]: row[1:] for row in cur.fetchall()}
+        cur.close()
+
+    def prefetch(self, section, ids):
+        # Pull any rows another process added since load() in one query.
+        table, key = TABLES[section]
+        now = time.monotonic()
+        with self.lock:
+            wanted = [
+                id for id in set(ids)
+                if id not in self.known[section]
+                and self.misses[section].get(id, 0) <= now
+            ]
+        if not wanted:
+            return
+
+        cur = self.conn.cursor()
+        for i in range(0, len(wanted), 500):
+            chunk = wanted[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            cur.execute(
+                f"SELECT {key}, name, email, phone FROM {table} WHERE {key} IN ({marks})",
+                chunk,
+            )
+            rows = cur.fetchall()
+            with self.lock:
+                for row in rows:
+                    self.known[section][row[0]] = row[1:]
+        cur.close()
+
+    def lookup(self, section, id):
+        return self.known[section].get(id)
+
+    def needs_fetch(self, section, id):
+        with self.lock:
+            if id in self.known[section]:
+                return False
+            return self.misses[section].get(id, 0) <= time.monotonic()
+
+    def resolve(self, section, id, fetch):
+        # fetch() returns a (name, email, phone) tuple, or None when the
+        # listing has nothing to offer for this ID; only that is remembered
+        # as a miss. A fetch that raised (error page, timeout) is not.
+        with self.lock:
+            row = self.known[section].get(id)
+            if row is not None:
+                return row
+            if self.misses[section].get(id, 0) > time.monotonic():
+                return None
+            future = self.inflight[section].get(id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[section][id] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            row = fetch()
+        except Exception as e:
+            with self.lock:
+                del self.inflight[section][id]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            if row is None:
+                self.misses[section][id] = time.monotonic() + self.miss_ttl
+            else:
+                self.known[section][id] = row
+            del self.inflight[section][id]
+        if row is not None:
+            self.save(section, id, row)
+        future.set_result(row)
+        return row
+
+    def save(self, section, id, row):
+        table, key = TABLES[section]
+        self.writer.add(
+            f"INSERT OR IGNORE INTO {table}({key},name,email,phone) VALUES(?,?,?,?)",
+            (id, *row),
+        )
@@ -0,0 +1,245 @@
+import hashlib
+import time
+from dbwriter import connect
+from export import export_query
+import metrics
+
+# One schema for sale and rent listings, shared by every scraper. Agent and
+# office details live once in agents/offices and listings point at them by
+# key; exports put the flat COLUMNS layout back together with joins.
+DB_PATH = "agents_and_offices.db"
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS agents (
+      agentId TEXT PRIMARY KEY,
+      name    TEXT,
+      email   TEXT,
+      phone   TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS offices (
+      officeId TEXT PRIMARY KEY,
+      name      TEXT,
+      email     TEXT,
+      phone     TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS listings (
+      link          TEXT PRIMARY KEY,
+      kind          TEXT NOT NULL,
+      street        TEXT,
+      zip           TEXT,
+      price         INTEGER,
+      beds          INTEGER,
+      baths         INTEGER,
+      sf1           INTEGER,
+      sf2           INTEGER,
+      year          INTEGER,
+      type          TEXT,
+      agentId       TEXT REFERENCES agents(agentId),
+      officeId      TEXT REFERENCES offices(officeId),
+      parcel_number TEXT,
+      status        TEXT,
+      content_hash  TEXT,
+      first_seen    REAL,
+      last_seen     REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS listing_history (
+      link   TEXT NOT NULL,
+      at     REAL NOT NULL,
+      price  INTEGER,
+      status TEXT,
+      PRIMARY KEY (link, at)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS listings_zip ON listings(kind, zip)",
+    "CREATE INDEX IF NOT EXISTS listings_price ON listings(kind, price)",
+    "CREATE INDEX IF NOT EXISTS listings_type ON listings(kind, type)",
+    "CREATE INDEX IF NOT EXISTS listings_last_seen ON listings(last_seen)",
+]
+
+EXPORT_SQL = """
+  SELECT l.link, l.street, l.zip, l.price, l.beds, l.baths, l.sf1, l.sf2, l.year,
+         l.type    AS property_and_building_type,
+         a.name    AS listing_provided_agent_name,
+         a.email   AS listing_provided_agent_email,
+         a.phone   AS listing_provided_agent_number,
+         o.name    AS listing_provided_office_name,
+         o.email   AS listing_provided_office_email,
+         o.phone   AS listing_provided_office_number,
+         l.parcel_number
+  FROM listings l
+  LEFT JOIN agents  a ON a.agentId  = l.agentId
+  LEFT JOIN offices o ON o.officeId = l.officeId
+  WHERE l.kind = ? AND l.last_seen >= ?
+  ORDER BY l.rowid
+"""
+
+# columns added after the listings table was first created
+MIGRATIONS = {
+    "listings": [("status", "TEXT"), ("content_hash", "TEXT")],
+}
+
+HASH_FIELDS = [
+    "street", "zip", "price", "beds", "baths", "sf1", "sf2", "year", "type",
+    "agentId", "officeId", "parcel_number", "status",
+]
+
+UPSERT_SQL = """
+  INSERT INTO listings (
+    link, kind, street, zip, price, beds, baths, sf1, sf2, year, type,
+    agentId, officeId, parcel_number, status, content_hash, first_seen, last_seen
+  ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+  ON CONFLICT(link) DO UPDATE SET
+    kind = excluded.kind, street = excluded.street, zip = excluded.zip,
+    price = excluded.price, beds = excluded.beds, baths = excluded.baths,
+    sf1 = excluded.sf1, sf2 = excluded.sf2, year = excluded.year,
+    type = excluded.type, agentId = excluded.agentId,
+    officeId = excluded.officeId, parcel_number = excluded.parcel_number,
+    status = excluded.status, content_hash = excluded.content_hash,
+    last_seen = excluded.last_seen
+  WHERE listings.content_hash IS NOT excluded.content_hash
+"""
+
+CONTACT_TABLES = {
+    "agent": ("agents", "agentId"),
+    "office": ("offices", "officeId"),
+}
+
+
+def init_db(path=DB_PATH):
+    conn = connect(path)
+    with conn:
+        for sql in TABLES:
+            conn.execute(sql)
+        for table, columns in MIGRATIONS.items():
+            have = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for name, decl in columns:
+                if name not in have:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+    return conn
+
+
+def contact_key(name, email, phone):
+    # Detail pages carry no agent/office id, so contacts seen only there are
+    # keyed by their content.
+    if not (name or email or phone):
+        return None
+    blob = "\x1f".join((name, email, phone))
+    return "c:" + hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(values):
+    blob = "\x1f".join("" if v is None else str(v) for v in values)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+class ListingStore:
+    # Writes listing records (records.Listing or dicts keyed by COLUMNS) into
+    # the normalized tables through a BatchWriter. The content hash, price,
+    # status and last_seen of every stored listing are kept in memory, so a
+    # listing that did not change only gets its last_seen bumped, once per
+    # run (`since` is when the run started), and only price or status
+    # transitions are appended to listing_history. What was handed to the
+    # writer waits in `queued` and only moves to the caches once the writer
+    # committed it, so a failed flush cannot make a listing look saved.
+    def __init__(self, conn, writer, kind, since=None):
+        self.conn = conn
+        self.writer = writer
+        self.kind = kind
+        self.since = time.time() if since is None else since
+        self.contacts = {
+            section: {row[0] for row in conn.execute(f"SELECT {key} FROM {table}")}
+            for section, (table, key) in CONTACT_TABLES.items()
+        }
+        cur = conn.execute(
+            "SELECT link, content_hash, price, status, last_seen FROM listings WHERE kind = ?",
+            (kind,),
+        )
+        self.stored = {row[0]: row[1:] for row in cur}
+        cur.close()
+        self.queued = {}
+        self.queued_contacts = {section: set() for section in CONTACT_TABLES}
+        self.waiting = False
+
+    def queue(self):
+        if not self.waiting:
+            self.waiting = True
+            self.writer.on_commit(self.committed)
+
+    def committed(self):
+        self.waiting = False
+        self.stored.update(self.queued)
+        self.queued.clear()
+        for section, ids in self.queued_contacts.items():
+            self.contacts[section] |= ids
+            ids.clear()
+
+    def contact(self, section, id, rec):
+        prefix = f"listing_provided_{section}_"
+        row = (
+            rec.get(prefix + "name") or "",
+            rec.get(prefix + "email") or "",
+            rec.get(prefix + "number") or "",
+        )
+        id = id or contact_key(*row)
+        queued = self.queued_contacts[section]
+        if id and any(row) and id not in self.contacts[section] and id not in queued:
+            table, key = CONTACT_TABLES[section]
+            self.writer.add(
+                f"INSERT OR IGNORE INTO {table}({key},name,email,phone) VALUES(?,?,?,?)",
+                (id, *row),
+            )
+            queued.add(id)
+            self.queue()
+        return id
+
+    def save(self, rec, agent_id=None, office_id=None, status=None):
+        agent_id = self.contact("agent", agent_id, rec)
+        office_id = self.contact("office", office_id, rec)
+        fields = {
+            "street": rec.get("street", ""), "zip": rec.get("zip", ""),
+            "price": rec.get("price", 0), "beds": rec.get("beds", 0),
+            "baths": rec.get("baths", 0), "sf1": rec.get("sf1", 0),
+            "sf2": rec.get("sf2", 0), "year": rec.get("year", 0),
+            "type": rec.get("property_and_building_type", ""),
+            "agentId": agent_id, "officeId": office_id,
+            "parcel_number": rec.get("parcel_number") or "", "status": status,
+        }
+        digest = content_hash(fields[name] for name in HASH_FIELDS)
+        link = rec["link"]
+        now = time.time()
+
+        old = self.queued.get(link) or self.stored.get(link)
+        if old is not None and old[0] == digest:
+            metrics.count("rows_unchanged")
+            if (old[3] or 0) < self.since:
+                self.writer.add("UPDATE listings SET last_seen = ? WHERE link = ?", (now, link))
+                self.queued[link] = (*old[:3], now)
+                self.queue()
+            return False
+
+        metrics.count("rows_changed" if old is not None else "rows_new")
+        self.writer.add(UPSERT_SQL, (
+            link, self.kind, *(fields[name] for name in HASH_FIELDS[:-1]),
+            status, digest, now, now,
+        ))
+        if old is None or (old[1], old[2]) != (fields["price"], status):
+            self.writer.add(
+                "INSERT OR IGNORE INTO listing_history(link, at, price, status) VALUES(?,?,?,?)",
+                (link, now, fields["price"], status),
+            )
+        self.queued[link] = (digest, fields["price"], status, now)
+        self.queue()
+        return True
+
+
+def export(conn, kind, path, since):
+    # streams the joined listings of one kind seen since `since` (the start
+    # of the run) into an export file; delisted homes are left out
+    return export_query(conn, EXPORT_SQL, path, (kind, since))
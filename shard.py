@@ -0,0 +1,157 @@
+import logging
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from main import build_parser, configure
+from homelist import fetch_page
+from pipeline import DetailPipeline
+from resolver import Resolver
+from dbwriter import BatchWriter
+from reqsell import init_db
+from workqueue import QUEUE_DB, LEASE, WorkQueue
+import client
+import metrics
+import reqrent
+import reqsell
+import schema
+
+# Sharded crawl: API pages are work units in a WorkQueue and any number of
+# worker processes, here or on other machines sharing this directory, claim
+# them and write into the shared database. The coordinator queues the first
+# LOOKAHEAD pages, every non-empty page queues the LOOKAHEAD after it, and
+# once the queue is drained the coordinator exports the merged listings.
+LOOKAHEAD = 32
+POLL = 1.0
+WORKERS = 4
+
+EXPORTS = {
+    "sale": "homes-sell",
+    "rent": "homes-rent",
+}
+
+log = logging.getLogger("shard")
+
+
+def parse_args(argv=None):
+    parser = build_parser()
+    parser.add_argument("kind", choices=sorted(EXPORTS),
+                        help="which listings to crawl")
+    parser.add_argument("--workers", type=int, default=WORKERS, metavar="N",
+                        help="worker processes to start next to the coordinator")
+    parser.add_argument("--join", action="store_true",
+                        help="only work through the queue of a crawl started elsewhere")
+    parser.add_argument("--queue", default=QUEUE_DB, metavar="PATH",
+                        help="SQLite file holding the work units")
+    parser.add_argument("--lease", type=float, default=LEASE, metavar="SECS",
+                        help="how long a silent worker keeps its page before it is handed out again")
+    return parser.parse_args(argv)
+
+
+def page_scraper(kind, conn, writer, details, since, parcel):
+    store = schema.ListingStore(conn, writer, kind, since)
+    if kind == "rent":
+        resolver = Resolver(conn, writer)
+        return lambda homes, scraped: reqrent.scrape_page(
+            homes, store, details, resolver, scraped=scraped, parcel=parcel)
+    return lambda homes, scraped: reqsell.scrape_page(
+        homes, store, details, scraped=scraped, parcel=parcel)
+
+
+def work(kind, queue, owner, parcel=False):
+    # Claims pages until none are pending or leased anywhere. Returns how
+    # many listings this process scraped.
+    conn, cur = init_db()
+    writer = BatchWriter(conn)
+    details = DetailPipeline()
+    scrape = page_scraper(kind, conn, writer, details, queue.started(kind), parcel)
+    scraped = 0
+
+    while True:
+        unit = queue.claim(kind, owner)
+        if unit is None:
+            if not queue.remaining(kind):
+                break
+            # pages leased by other workers may still queue more
+            time.sleep(POLL)
+            continue
+
+        page = int(unit)
+        try:
+            with queue.lease(kind, unit, owner):
+                homes = fetch_page(kind, page)
+                if homes:
+                    queue.add(kind, range(page + 1, page + 1 + LOOKAHEAD))
+                    log.info("[shard] %s: %s page %s", owner, kind, page)
+                    scraped, _ = scrape(homes, scraped)
+                writer.flush()
+        except Exception as e:
+            metrics.count("errors")
+            log.warning("[shard] %s page %s failed: %s", kind, page, e)
+            queue.fail(kind, unit, owner, repr(e))
+            continue
+        queue.complete(kind, unit, owner)
+
+    details.close()
+    writer.close()
+    cur.close()
+    conn.close()
+    return scraped
+
+
+def coordinate(args, argv, owner):
+    queue = WorkQueue(args.queue, args.lease)
+    if not args.resume:
+        queue.reset(args.kind)
+    since = queue.started(args.kind)
+    queue.add(args.kind, range(LOOKAHEAD))
+
+    command = [sys.executable, os.path.abspath(__file__), *argv, "--join"]
+    workers = [subprocess.Popen(command) for _ in range(args.workers)]
+    log.info("[shard] Started %s workers on %s", len(workers), args.queue)
+
+    # The coordinator works too, which also finishes the pages of workers
+    # that died once their leases run out.
+    scraped = work(args.kind, queue, owner, bool(args.parcel))
+    for proc in workers:
+        if proc.wait():
+            log.warning("[shard] Worker %s exited with %s", proc.pid, proc.returncode)
+
+    counts = queue.counts(args.kind)
+    for unit, error in queue.failures(args.kind):
+        log.warning("[shard] %s page %s gave up: %s", args.kind, unit, error)
+    queue.close()
+
+    conn, cur = init_db()
+    exported = schema.export(conn, args.kind, f"{EXPORTS[args.kind]}.{args.format}", since)
+    log.info("[shard] %s pages done, %s failed, %s scraped here, %s exported",
+             counts.get("done", 0), counts.get("failed", 0), scraped, exported)
+    cur.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    args = parse_args()
+    owner = f"{socket.gethostname()}-{os.getpid()}"
+    if args.join:
+        # workers keep their metrics and profiles apart from the coordinator's
+        if args.metrics:
+            args.metrics = f"{args.metrics}-{owner}"
+        if args.profile:
+            args.profile = os.path.join(args.profile, owner)
+    configure(args)
+    start = time.perf_counter()
+    if args.join:
+        queue = WorkQueue(args.queue, args.lease)
+        scraped = work(args.kind, queue, owner, bool(args.parcel))
+        queue.close()
+        log.info("[shard] %s scraped %s listings", owner, scraped)
+    else:
+        coordinate(args, sys.argv[1:], owner)
+    client.close()
+    end = time.perf_counter()
+    log.info("Code Ran For: %s", timedelta(seconds=(end - start)))
\ No newline at end of file
@@ -0,0 +1,77 @@
+import unittest
+from parcel import BACKENDS, MISSING, extract_parcel, parcel_bs4
+import bench_server
+
+# python -m unittest test_parcel
+#
+# Every backend has to give the same answer as bs4 on every page; the fast
+# ones may return MISSING and let extract_parcel fall back to bs4.
+
+DETAILS = '<span class="item-title">Details</span>'
+
+CASES = {
+    "sibling ul": f"<div>{DETAILS}<ul><li>Parcel Number: 123</li></ul></div>",
+    "sibling after other elements":
+        f"<div>{DETAILS}<br><p>text <b>bold</b></p><img src=x /><ul><li>Parcel Number: 7</li></ul></div>",
+    "nested ul inside the sibling":
+        f"<div>{DETAILS}<ul><li>Lot</li><li><ul><li>x</li></ul></li><li>Parcel Number: 42</li></ul></div>",
+    "tags and entities in the item":
+        f"<div>{DETAILS}<ul><li><b>Parcel Number:</b> 55&#49;</li></ul></div>",
+    "no parcel in the sibling":
+        f"<div>{DETAILS}<ul><li>Zoning: R1</li></ul></div><ul><li>Parcel Number: 1</li></ul>",
+    "no sibling ul":
+        f"<div>{DETAILS}</div><div><ul><li>Parcel Number: 999</li></ul></div>",
+    "ul nested in a sibling div":
+        f"<div>{DETAILS}<div><ul><li>Parcel Number: 5</li></ul></div></div>",
+    "two Details spans":
+        f"<div>{DETAILS}<p>none</p></div><div>{DETAILS}<ul><li>Parcel Number: 8</li></ul></div>",
+    "ul before the label":
+        f"<div><ul><li>Parcel Number: 3</li></ul>{DETAILS}</div>",
+    "no Details label": "<div><ul><li>Parcel Number: 4</li></ul></div>",
+    "mismatched tags":
+        f"<div>{DETAILS}<p><span>x</p></span><ul><li>Parcel Number: 6</li></ul></div>",
+}
+
+
+def stand_in_page():
+    home = bench_server.synthetic_home("sale", 1)
+    return bench_server.synthetic_detail(home), home["parcel"]
+
+
+class ParcelBackendTest(unittest.TestCase):
+    def backends(self):
+        for name, parse in BACKENDS.items():
+            try:
+                parse("<html></html>")
+            except ImportError:
+                continue
+            yield name, parse
+
+    def test_backends_agree_with_bs4(self):
+        for case, text in CASES.items():
+            expected = parcel_bs4(text)
+            for name, _ in self.backends():
+                with self.subTest(case=case, backend=name):
+                    self.assertEqual(extract_parcel(text, name), expected)
+
+    def test_bs4_reference(self):
+        self.assertEqual(parcel_bs4(CASES["sibling ul"]), "123")
+        self.assertEqual(parcel_bs4(CASES["tags and entities in the item"]), "551")
+        for case in ("no sibling ul", "ul nested in a sibling div", "two Details spans"):
+            self.assertIsNone(parcel_bs4(CASES[case]), case)
+
+    def test_scan_answers_ordinary_pages_itself(self):
+        text, parcel = stand_in_page()
+        self.assertEqual(BACKENDS["scan"](text), parcel)
+        self.assertEqual(BACKENDS["scan"](CASES["sibling after other elements"]), "7")
+        self.assertIsNot(BACKENDS["scan"](CASES["no parcel in the sibling"]), MISSING)
+
+    def test_stand_in_page(self):
+        text, parcel = stand_in_page()
+        for name, _ in self.backends():
+            with self.subTest(backend=name):
+                self.assertEqual(extract_parcel(text, name), parcel)
+
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+import schema
+from dbwriter import BatchWriter
+
+# python -m unittest test_schema
+
+
+def listing(link="https://cozying.ai/home-1", price=500000, **fields):
+    rec = {
+        "link": link, "street": "1 Main St", "zip": "90001", "price": price,
+        "beds": 3, "baths": 2, "sf1": 1200, "sf2": 4000, "year": 1990,
+        "property_and_building_type": "Single Family",
+        "listing_provided_agent_name": "Agent", "listing_provided_agent_email": "a@example.com",
+        "listing_provided_agent_number": "555-0100",
+        "listing_provided_office_name": "Office", "listing_provided_office_email": "o@example.com",
+        "listing_provided_office_number": "555-0200",
+    }
+    rec.update(fields)
+    return rec
+
+
+class ListingStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "listings.db")
+        self.conns = []
+
+    def tearDown(self):
+        for conn in self.conns:
+            conn.close()
+        self.tmp.cleanup()
+
+    def open(self, since=None):
+        # a store as one scraper run sees it; batches only flush when asked
+        conn = schema.init_db(self.path)
+        self.conns.append(conn)
+        writer = BatchWriter(conn, batch_size=float("inf"), flush_interval=float("inf"))
+        return schema.ListingStore(conn, writer, "sale", since), writer
+
+    def query(self, sql):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_new_listing(self):
+        store, writer = self.open()
+        self.assertTrue(store.save(listing(), "A1", "O1", "active"))
+        writer.flush()
+        self.assertEqual(self.query("SELECT link, price, agentId, officeId, status FROM listings"),
+                         [("https://cozying.ai/home-1", 500000, "A1", "O1", "active")])
+        self.assertEqual(self.query("SELECT agentId, name FROM agents"), [("A1", "Agent")])
+        self.assertEqual(self.query("SELECT price, status FROM listing_history"),
+                         [(500000, "active")])
+
+    def test_unchanged_save_writes_nothing(self):
+        store, writer = self.open()
+        store.save(listing(), "A1", "O1", "active")
+        writer.flush()
+        # queued or committed, the same record again is not written
+        self.assertFalse(store.save(listing(), "A1", "O1", "active"))
+        self.assertEqual(writer.count, 0)
+        self.assertFalse(store.save(listing(), "A1", "O1", "active"))
+        self.assertEqual(writer.count, 0)
+
+        # a later run only bumps last_seen, once
+        time.sleep(0.01)
+        store, writer = self.open()
+        self.assertFalse(store.save(listing(), "A1", "O1", "active"))
+        self.assertEqual(writer.count, 1)
+        self.assertFalse(store.save(listing(), "A1", "O1", "active"))
+        self.assertEqual(writer.count, 1)
+        writer.flush()
+        first_seen, last_seen = self.query("SELECT first_seen, last_seen FROM listings")[0]
+        self.assertGreater(last_seen, first_seen)
+        self.assertEqual(len(self.query("SELECT * FROM listing_history")), 1)
+
+    def test_price_change_writes_one_history_row(self):
+        store, writer = self.open()
+        store.save(listing(), "A1", "O1", "active")
+        writer.flush()
+        time.sleep(0.01)
+        self.assertTrue(store.save(listing(price=450000), "A1", "O1", "active"))
+        writer.flush()
+        self.assertEqual(self.query("SELECT price FROM listings"), [(450000,)])
+        self.assertEqual(self.query("SELECT price, status FROM listing_history ORDER BY at"),
+                         [(500000, "active"), (450000, "active")])
+
+    def test_other_changes_write_no_history(self):
+        store, writer = self.open()
+        store.save(listing(), "A1", "O1", "active")
+        writer.flush()
+        self.assertTrue(store.save(listing(beds=4), "A1", "O1", "active"))
+        writer.flush()
+        self.assertEqual(self.query("SELECT beds FROM listings"), [(4,)])
+        self.assertEqual(len(self.query("SELECT * FROM listing_history")), 1)
+
+    def test_status_change_writes_history(self):
+        store, writer = self.open()
+        store.save(listing(), "A1", "O1", "active")
+        writer.flush()
+        time.sleep(0.01)
+        store.save(listing(), "A1", "O1", "pending")
+        writer.flush()
+        self.assertEqual(self.query("SELECT status FROM listing_history ORDER BY at"),
+                         [("active",), ("pending",)])
+
+    def test_contacts_by_content_without_id(self):
+        store, writer = self.open()
+        store.save(listing())
+        store.save(listing("https://cozying.ai/home-2"))
+        writer.flush()
+        agents = self.query("SELECT agentId FROM agents")
+        self.assertEqual(len(agents), 1)
+        self.assertTrue(agents[0][0].startswith("c:"))
+        self.assertEqual(self.query("SELECT DISTINCT agentId FROM listings"), agents)
+
+    def test_failed_flush_does_not_mark_listings_stored(self):
+        store, writer = self.open()
+        store.conn.execute("PRAGMA busy_timeout = 50")
+        store.save(listing(), "A1", "O1", "active")
+
+        blocker = sqlite3.connect(self.path)
+        blocker.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(sqlite3.OperationalError):
+            writer.flush()
+        # the rows wait in the writer and the caches still do not know them
+        self.assertEqual(writer.count, 4)
+        self.assertNotIn("https://cozying.ai/home-1", store.stored)
+        self.assertNotIn("A1", store.contacts["agent"])
+        blocker.rollback()
+        blocker.close()
+
+        writer.flush()
+        self.assertEqual(writer.count, 0)
+        self.assertIn("https://cozying.ai/home-1", store.stored)
+        self.assertIn("A1", store.contacts["agent"])
+        self.assertEqual(len(self.query("SELECT * FROM listings")), 1)
+        self.assertEqual(len(self.query("SELECT * FROM listing_history")), 1)
+
+    def test_export_takes_listings_seen_this_run(self):
+        store, writer = self.open()
+        store.save(listing(), "A1", "O1", "active")
+        store.save(listing("https://cozying.ai/home-2"), "A1", "O1", "active")
+        writer.flush()
+        time.sleep(0.01)
+        store, writer = self.open()
+        store.save(listing(), "A1", "O1", "active")
+        writer.flush()
+        path = os.path.join(self.tmp.name, "homes.csv")
+        self.assertEqual(schema.export(store.conn, "sale", path, store.since), 1)
+
+
+class BatchWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "rows.db")
+        self.conn = sqlite3.connect(self.path, timeout=0.05, check_same_thread=False)
+        self.conn.execute("CREATE TABLE t (n INTEGER)")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def rows(self):
+        return self.conn.execute("SELECT n FROM t ORDER BY n").fetchall()
+
+    def test_flushes_by_size(self):
+        writer = BatchWriter(self.conn, batch_size=3, flush_interval=float("inf"))
+        for n in range(4):
+            writer.add("INSERT INTO t VALUES(?)", (n,))
+        self.assertEqual(self.rows(), [(0,), (1,), (2,)])
+        writer.close()
+        self.assertEqual(len(self.rows()), 4)
+
+    def test_failed_flush_keeps_rows_and_callbacks(self):
+        writer = BatchWriter(self.conn, batch_size=float("inf"), flush_interval=float("inf"))
+        committed = []
+        writer.add("INSERT INTO t VALUES(?)", (1,))
+        writer.on_commit(lambda: committed.append(1))
+
+        blocker = sqlite3.connect(self.path)
+        blocker.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(sqlite3.OperationalError):
+            writer.flush()
+        self.assertEqual(committed, [])
+        writer.add("INSERT INTO t VALUES(?)", (2,))
+        blocker.rollback()
+        blocker.close()
+
+        writer.flush()
+        self.assertEqual(self.rows(), [(1,), (2,)])
+        self.assertEqual(committed, [1])
+        writer.flush()
+        self.assertEqual(committed, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
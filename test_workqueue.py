@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+import workqueue
+from workqueue import WorkQueue
+
+# python -m unittest test_workqueue
+
+
+class WorkQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "queue.db")
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.close()
+        self.tmp.cleanup()
+
+    def open(self, lease=workqueue.LEASE):
+        # one WorkQueue per simulated worker process, all on the same file
+        queue = WorkQueue(self.path, lease)
+        self.queues.append(queue)
+        return queue
+
+    def test_claims_in_order_until_drained(self):
+        queue = self.open()
+        queue.add("sale", range(3))
+        queue.add("sale", [1, 2, 3])
+        claimed = [queue.claim("sale", "a") for _ in range(5)]
+        self.assertEqual(claimed, ["0", "1", "2", "3", None])
+        self.assertEqual(queue.remaining("sale"), 4)
+        for unit in claimed[:4]:
+            queue.complete("sale", unit, "a")
+        self.assertEqual(queue.remaining("sale"), 0)
+        self.assertEqual(queue.counts("sale"), {"done": 4})
+
+    def test_jobs_are_separate(self):
+        queue = self.open()
+        queue.add("sale", [0])
+        self.assertIsNone(queue.claim("rent", "a"))
+        self.assertEqual(queue.claim("sale", "a"), "0")
+
+    def test_live_lease_is_not_handed_out(self):
+        a, b = self.open(), self.open()
+        a.add("sale", [0])
+        self.assertEqual(a.claim("sale", "a"), "0")
+        self.assertIsNone(b.claim("sale", "b"))
+        self.assertEqual(b.remaining("sale"), 1)
+
+    def test_expired_lease_is_reclaimed(self):
+        a, b = self.open(lease=0.1), self.open(lease=0.1)
+        a.add("sale", [0])
+        self.assertEqual(a.claim("sale", "a"), "0")
+        time.sleep(0.2)
+        self.assertEqual(b.claim("sale", "b"), "0")
+        # the first worker lost it and can neither renew nor finish it
+        self.assertFalse(a.heartbeat("sale", "0", "a"))
+        a.complete("sale", "0", "a")
+        self.assertEqual(b.counts("sale"), {"leased": 1})
+        self.assertTrue(b.heartbeat("sale", "0", "b"))
+        b.complete("sale", "0", "b")
+        self.assertEqual(b.counts("sale"), {"done": 1})
+
+    def test_heartbeats_keep_the_lease(self):
+        a, b = self.open(lease=0.3), self.open(lease=0.3)
+        a.add("sale", [0])
+        unit = a.claim("sale", "a")
+        with a.lease("sale", unit, "a") as lease:
+            self.assertAlmostEqual(lease.interval, 0.1)
+            time.sleep(0.7)
+            self.assertIsNone(b.claim("sale", "b"))
+        a.complete("sale", unit, "a")
+        self.assertEqual(b.counts("sale"), {"done": 1})
+
+    def test_failed_unit_is_retried_then_given_up(self):
+        queue = self.open()
+        queue.add("sale", [0])
+        for attempt in range(workqueue.MAX_ATTEMPTS):
+            self.assertEqual(queue.claim("sale", "a"), "0")
+            queue.fail("sale", "0", "a", f"error {attempt}")
+        self.assertIsNone(queue.claim("sale", "a"))
+        self.assertEqual(queue.remaining("sale"), 0)
+        self.assertEqual(queue.failures("sale"), [("0", f"error {workqueue.MAX_ATTEMPTS - 1}")])
+
+    def test_expired_lease_on_last_attempt_fails(self):
+        queue = self.open(lease=0.05)
+        queue.add("sale", [0])
+        for _ in range(workqueue.MAX_ATTEMPTS):
+            self.assertEqual(queue.claim("sale", "a"), "0")
+            time.sleep(0.1)
+        self.assertIsNone(queue.claim("sale", "a"))
+        self.assertEqual(queue.remaining("sale"), 0)
+        self.assertEqual(queue.failures("sale"), [("0", "lease expired")])
+
+    def test_concurrent_workers_never_share_a_unit(self):
+        queues = [self.open() for _ in range(4)]
+        queues[0].add("sale", range(200))
+        claimed = [[] for _ in queues]
+
+        def work(i):
+            while True:
+                unit = queues[i].claim("sale", f"w{i}")
+                if unit is None:
+                    return
+                claimed[i].append(unit)
+                queues[i].complete("sale", unit, f"w{i}")
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(len(queues))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        units = [unit for units in claimed for unit in units]
+        self.assertEqual(sorted(units, key=int), [str(i) for i in range(200)])
+        self.assertEqual(queues[0].counts("sale"), {"done": 200})
+
+    def test_started_is_shared_until_reset(self):
+        a, b = self.open(), self.open()
+        started = a.started("sale")
+        self.assertEqual(b.started("sale"), started)
+        a.add("sale", [0])
+        time.sleep(0.01)
+        a.reset("sale")
+        self.assertEqual(a.remaining("sale"), 0)
+        self.assertGreater(b.started("sale"), started)
+
+
+if __name__ == "__main__":
+    unittest.main()
\ No newline at end of file
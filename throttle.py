@@ -0,0 +1,197 @@
+import asyncio
+import collections
+import email.utils
+import logging
+import random
+import threading
+import time
+import metrics
+
+log = logging.getLogger("throttle")
+
+# AIMD concurrency control shared by every request to the site, whether it
+# comes from client.get (requests scrapers, HTTP detail fetches) or from a
+# Playwright page load. The limit grows by one slot per "window" of healthy
+# responses and is halved on throttling, errors or slow responses, at most
+# once per COOLDOWN seconds so one burst of 429s only counts once.
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 32
+TARGET_LATENCY = 5.0
+# A page.goto that waits for "load" also waits for scripts and subresources,
+# so browser navigations are only called slow past this much.
+BROWSER_TARGET_LATENCY = 30.0
+BACKOFF_FACTOR = 0.5
+COOLDOWN = 2.0
+
+# Retries: full jitter exponential backoff, never past the request deadline.
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.5
+MAX_DELAY = 30.0
+DEADLINE = 120.0
+
+OK = "ok"
+SLOW = "slow"
+ERROR = "error"
+THROTTLED = "throttled"
+
+
+class _Waiter:
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class AIMDLimiter:
+    # Thread-safe; async callers wait on a future of their own loop, so the
+    # same limiter can be used from worker threads and from asyncio code.
+    def __init__(self, initial=INITIAL_LIMIT, minimum=MIN_LIMIT, maximum=MAX_LIMIT,
+                 target_latency=TARGET_LATENCY, backoff=BACKOFF_FACTOR,
+                 cooldown=COOLDOWN):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.lock = threading.Lock()
+        self.waiters = collections.deque()
+
+    def capacity(self):
+        return int(self.limit)
+
+    def try_acquire_locked(self, wake):
+        if not self.waiters and self.in_flight < self.capacity():
+            self.in_flight += 1
+            return None
+        waiter = _Waiter(wake)
+        self.waiters.append(waiter)
+        return waiter
+
+    def wake_locked(self):
+        while self.waiters and self.in_flight < self.capacity():
+            waiter = self.waiters.popleft()
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+
+    def acquire(self, timeout=None):
+        event = threading.Event()
+        with self.lock:
+            waiter = self.try_acquire_locked(event.set)
+        if waiter is None:
+            return True
+        if event.wait(timeout):
+            return True
+        with self.lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            return False
+
+    async def acquire_async(self, timeout=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: future.done() or future.set_result(None)
+            )
+
+        with self.lock:
+            waiter = self.try_acquire_locked(wake)
+        if waiter is None:
+            return True
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self.lock:
+                if waiter.granted:
+                    return True
+                waiter.cancelled = True
+                return False
+        except asyncio.CancelledError:
+            with self.lock:
+                waiter.cancelled = True
+                granted = waiter.granted
+            if granted:
+                self.release()
+            raise
+
+    def release(self, latency=None, outcome=OK, target_latency=None):
+        if target_latency is None:
+            target_latency = self.target_latency
+        if outcome == OK and latency is not None and latency > target_latency:
+            outcome = SLOW
+        with self.lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if outcome == OK:
+                # +1 slot after roughly `limit` healthy responses
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif now - self.last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self.last_decrease = now
+                metrics.count("throttle_backoffs")
+                log.warning("[throttle] %s, concurrency limit now %s", outcome, self.capacity())
+            self.wake_locked()
+
+
+def outcome_for(status):
+    if status in THROTTLE_STATUSES:
+        return THROTTLED
+    if status >= 500:
+        return ERROR
+    return OK
+
+
+def retry_after(headers):
+    # Retry-After is either seconds or an HTTP date. Playwright lower-cases
+    # header names, requests does not care.
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt, wait=None):
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+    if wait is not None:
+        delay = max(delay, min(wait, MAX_DELAY))
+    return delay
+
+
+_limiter = None
+_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    global _limiter
+    with _lock:
+        _limiter = AIMDLimiter(**kwargs)
+    return _limiter
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                _limiter = AIMDLimiter()
+    return _limiter
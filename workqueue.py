@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from dbwriter import connect
+import metrics
+
+# Work units shared by every process of a sharded crawl, in one SQLite
+# file. A worker claims a unit with a lease of LEASE seconds and renews it
+# HEARTBEATS times per lease while it works; a unit whose lease runs out
+# (the worker died or hung) goes to the next worker that asks. A unit that
+# failed MAX_ATTEMPTS times is parked as failed instead of retried forever.
+QUEUE_DB = "workqueue.db"
+LEASE = 120.0
+HEARTBEATS = 3
+MAX_ATTEMPTS = 5
+
+log = logging.getLogger("workqueue")
+
+
+class WorkQueue:
+    def __init__(self, path=QUEUE_DB, lease=LEASE):
+        self.lease_seconds = lease
+        self.conn = connect(path)
+        self.lock = threading.Lock()
+        with self.conn:
+            self.conn.execute("""
+              CREATE TABLE IF NOT EXISTS work_units (
+                job         TEXT NOT NULL,
+                unit        TEXT NOT NULL,
+                state       TEXT NOT NULL DEFAULT 'pending',
+                owner       TEXT,
+                lease_until REAL,
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                error       TEXT,
+                PRIMARY KEY (job, unit)
+              )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS work_units_state ON work_units(job, state)"
+            )
+            self.conn.execute("""
+              CREATE TABLE IF NOT EXISTS work_jobs (
+                job     TEXT PRIMARY KEY,
+                started REAL
+              )
+            """)
+
+    def started(self, job):
+        # when the job was first asked about since its last reset; workers
+        # and the coordinator all get the same answer
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO work_jobs(job, started) VALUES(?,?)",
+                (job, time.time()),
+            )
+            return self.conn.execute(
+                "SELECT started FROM work_jobs WHERE job = ?", (job,)
+            ).fetchone()[0]
+
+    def add(self, job, units):
+        # units already queued (in any state) are left alone
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO work_units(job, unit) VALUES(?,?)",
+                [(job, str(unit)) for unit in units],
+            )
+
+    def claim(self, job, owner):
+        # Oldest pending unit, or one whose lease expired; None when there
+        # is nothing to hand out right now.
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = self.conn.execute(
+                    "UPDATE work_units SET state = 'failed', error = 'lease expired' "
+                    "WHERE job = ? AND state = 'leased' AND lease_until < ? AND attempts >= ?",
+                    (job, now, MAX_ATTEMPTS),
+                ).rowcount
+                row = self.conn.execute(
+                    "SELECT unit, state, owner FROM work_units "
+                    "WHERE job = ? AND (state = 'pending' OR (state = 'leased' AND lease_until < ?)) "
+                    "ORDER BY rowid LIMIT 1",
+                    (job, now),
+                ).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE work_units SET state = 'leased', owner = ?, lease_until = ?, "
+                        "attempts = attempts + 1 WHERE job = ? AND unit = ?",
+                        (owner, now + self.lease_seconds, job, row[0]),
+                    )
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+
+        if expired:
+            metrics.count("units_failed", expired)
+        if row is None:
+            return None
+        unit, state, previous = row
+        if state == "leased":
+            metrics.count("leases_reclaimed")
+            log.warning("[queue] Reclaimed %s %s from %s", job, unit, previous)
+        return unit
+
+    def heartbeat(self, job, unit, owner):
+        # False once the lease is gone (expired and taken by someone else)
+        with self.lock, self.conn:
+            return self.conn.execute(
+                "UPDATE work_units SET lease_until = ? "
+                "WHERE job = ? AND unit = ? AND owner = ? AND state = 'leased'",
+                (time.time() + self.lease_seconds, job, unit, owner),
+            ).rowcount == 1
+
+    def complete(self, job, unit, owner):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE work_units SET state = 'done', lease_until = NULL, error = NULL "
+                "WHERE job = ? AND unit = ? AND owner = ?",
+                (job, unit, owner),
+            )
+        metrics.count("units_done")
+
+    def fail(self, job, unit, owner, error):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE work_units SET lease_until = NULL, error = ?, "
+                "state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END "
+                "WHERE job = ? AND unit = ? AND owner = ?",
+                (error, MAX_ATTEMPTS, job, unit, owner),
+            )
+        metrics.count("units_retried")
+
+    def lease(self, job, unit, owner, interval=None):
+        if interval is None:
+            interval = self.lease_seconds / HEARTBEATS
+        return Lease(self, job, unit, owner, interval)
+
+    def counts(self, job):
+        with self.lock:
+            cur = self.conn.execute(
+                "SELECT state, COUNT(*) FROM work_units WHERE job = ? GROUP BY state",
+                (job,),
+            )
+            return dict(cur.fetchall())
+
+    def remaining(self, job):
+        # units still pending or leased; 0 means the job is drained
+        counts = self.counts(job)
+        return counts.get("pending", 0) + counts.get("leased", 0)
+
+    def failures(self, job):
+        with self.lock:
+            cur = self.conn.execute(
+                "SELECT unit, error FROM work_units WHERE job = ? AND state = 'failed' "
+                "ORDER BY rowid",
+                (job,),
+            )
+            return cur.fetchall()
+
+    def reset(self, job):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM work_units WHERE job = ?", (job,))
+            self.conn.execute("DELETE FROM work_jobs WHERE job = ?", (job,))
+
+    def close(self):
+        self.conn.close()
+
+
+class Lease:
+    # Heartbeats a claimed unit from a background thread for as long as
+    # the with-block runs.
+    def __init__(self, queue, job, unit, owner, interval):
+        self.queue = queue
+        self.job = job
+        self.unit = unit
+        self.owner = owner
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            if not self.queue.heartbeat(self.job, self.unit, self.owner):
+                log.warning("[queue] Lost the lease on %s %s", self.job, self.unit)
+                return
\ No newline at end of file